@@ -0,0 +1,1371 @@
+##########################
+### The Story of Ocala ###
+##########################
+
+__author__ = """Adrian Torres"""
+__date__ = """04/10/2013"""
+__version__ = """0.5"""
+
+##########################
+###      Imports       ###
+##########################
+
+import random
+import os
+import time
+import heapq
+from array import array
+from collections import OrderedDict, Counter
+from contextlib import redirect_stdout
+from .getchar import getch, NonBlockingInput
+from .grid import TileGrid, Tileset, compileTileset, WALKABLE
+from .render import Renderer, MessageLog, renderRow, checkGlyph, setGlyph
+from .spatial import SpatialIndex
+from .combat import expReward
+from .scheduler import Scheduler
+from .pathfinding import FlowField, findPath
+from .chunks import ChunkedGrid, ChunkFile
+from . import savegame
+from .entities import Entity, STORE
+from .profiling import Profiler
+from .spawning import Spawner, SpawnZone
+from .fov import FieldOfView, SIGHT
+from .camera import Camera
+from .progression import progressionFor
+from .effects import EffectScheduler
+from . import content, events, loot
+from .events import EventBus, MessageSink, FileSink, NullSink
+
+##########################
+###  Global Variables  ###
+##########################
+
+# Keeps track of entities
+ID = 0
+# Keeps track of items
+ITEM_ID = 0
+# Keeps track of skills
+SKILL_ID = 0
+# Keeps track of maps
+MAP_ID = 0
+# ITEM_ID of the empty backpack slots
+EMPTY_SLOT = -1
+# Distance from the player within which mobs are awake (chasing and detecting)
+AI_RADIUS = 8
+# Steps the flow fields mobs chase along reach: walking only goes in 4 directions, so a mob AI_RADIUS
+# away can be up to twice that many steps from the player
+AI_STEPS = 2*AI_RADIUS
+# Simulation ticks and screen frames per second
+TICK_RATE = 20
+FRAME_RATE = 30
+# Seconds between each step of the mobs
+MOB_STEP = 0.5
+# Flow fields kept cached by each map
+FLOW_FIELDS = 4
+# Dead mobs kept around to be reused by later spawns
+MOB_POOL = 1024
+# Arrow keys, as named by the input reader, move like wasd
+ARROWS = {"UP": "w", "DOWN": "s", "LEFT": "a", "RIGHT": "d"}
+# Where the game is saved, and seconds between autosaves
+SAVE_PATH = "ocala.sav"
+AUTOSAVE = 5
+# Where the profiler dumps its numbers (.json, or .prom for the Prometheus text format), the
+# profiler and its debug line under the status bar are only enabled when it's set
+PROFILE_PATH = os.environ.get("OCALA_PROFILE")
+# Where the game is recorded for replays (see replay.py), nothing is recorded unless it's set
+RECORD_PATH = os.environ.get("OCALA_RECORD")
+# Worker processes simulating the maps the player isn't on (see worldsim.py), 0 to leave them frozen
+WORLD_WORKERS = int(os.environ.get("OCALA_WORKERS", "0"))
+# File the local game's events are logged to, if any
+EVENTS_PATH = os.environ.get("OCALA_EVENTS")
+# Seconds between profiler dumps
+PROFILE_DUMP = 10
+
+##########################
+###      Effects       ###
+##########################
+
+# Heals the player by the specified amount, caller is optional (mainly for the skill class)
+def heal(player, amount, caller=None):
+    if not player.dead:
+        if player.hp + amount > player.MAXHP:
+            player.hp = player.MAXHP
+        else:
+            player.hp += amount
+    else:
+        # Player is dead, cannot heal
+        eventsOf(player).emit(events.ACTOR_DEAD, player.name)
+
+# Heals 20 HP
+def heal_small(player, caller=None):
+    heal(player, 20)
+# Recovers the player's mana by the specified amount, caller is optional (mainly for the skill class)
+def mana(player, amount, caller=None):
+    if not player.dead:
+        if player.mp + amount > player.MAXMP:
+            player.mp = player.MAXMP
+        else:
+            player.mp += amount
+    else:
+        # Player is dead, cannot recover mana
+        eventsOf(player).emit(events.ACTOR_DEAD, player.name)
+
+# Recovers 20 MP
+def mana_small(player, caller=None):
+    mana(player, 10)
+
+# Heals 5 HP every second for 5 seconds
+def regen_small(player, caller=None):
+    effectsOf(player).overTime(player, 5, 1.0, 5)
+
+# Takes 3 HP every second for 5 seconds
+def poison(player, caller=None):
+    effectsOf(player).overTime(player, -3, 1.0, 5)
+
+# Raises the attack by 5 for 10 seconds
+def might(player, caller=None):
+    timers = effectsOf(player)
+    timers.buff(player, 'minAttack', 5, 10.0)
+    timers.buff(player, 'maxAttack', 5, 10.0)
+
+# Effects items and skills in the data file can have, by name
+EFFECTS = {'heal_small': heal_small,
+           'mana_small': mana_small,
+           'regen_small': regen_small,
+           'poison': poison,
+           'might': might,
+           }
+
+##########################
+### Class definitions  ###
+##########################
+
+# Skill class, for the creation, modification and cast of skills from the player/mob object to another player/mob object
+class Skill():
+
+    def __init__(self, name, effect, mpCost, requiredLevel, cooldown=0.0):
+        global SKILL_ID
+        self.ID = SKILL_ID
+        SKILL_ID += 1
+        self.name = name
+        self.effect = effect
+        self.mpCost = mpCost
+        # Required level for players to cast the skill
+        self.requiredLevel = requiredLevel
+        # Seconds before the skill can be cast again by the same caster
+        self.cooldown = cooldown
+
+    # Function for casting the skill on another object/on the caller, players need the level it requires.
+    # Returns whether it was cast
+    def cast(self, caller, receiver):
+        bus, timers = eventsOf(caller), effectsOf(caller)
+        if isinstance(caller, Player) and caller.level < self.requiredLevel:
+            bus.emit(events.LEVEL_TOO_LOW, caller.name, self.requiredLevel, self.name)
+            return False
+        if caller.mp < self.mpCost:
+            bus.emit(events.NO_MANA, caller.name, self.name)
+            return False
+        wait = timers.cooldown(caller, self.ID)
+        if wait > 0:
+            bus.emit(events.COOLDOWN, caller.name, self.name, wait)
+            return False
+        caller.mp -= self.mpCost
+        timers.startCooldown(caller, self.ID, self.cooldown)
+        timers.regen(caller)
+        self.effect(receiver, caller)
+        if caller != receiver:
+            eventsOf(caller).emit(events.CAST, caller.name, self.name, receiver.name)
+        else:
+            eventsOf(caller).emit(events.CAST_SELF, caller.name, self.name)
+        return True
+
+# Map class, for the creation and modification of maps, without changing the original
+class Map():
+
+    def __init__(self, name, mapTileSet, spawnSpots, spawnableMobs):
+        global MAP_ID
+        self.ID = MAP_ID
+        MAP_ID += 1
+        self.name = name
+        if isinstance(mapTileSet, (TileGrid, ChunkedGrid)):
+            # Ready-made grids, namely worlds streamed from disk and maps loaded from a save
+            self.grid = mapTileSet
+        else:
+            # Terrain is shared with every other map built from the same tileSet, and only copied when modified
+            self.grid = TileGrid(compileTileset(mapTileSet))
+        self.spawnSpots = spawnSpots
+        self.spawnableMobs = spawnableMobs
+        self.spawnSet = False
+        # Mobs living in the map, by ID
+        self.mobsInMap = {}
+        # Which entity object stands on which cell
+        self.index = SpatialIndex()
+        # Flow fields leading to each target, the most recently used last
+        self.flowFields = OrderedDict()
+        # Spawn zones of the map and their pending respawns
+        self.spawner = Spawner(self)
+        # Session the map belongs to, the one its battles are started in
+        self.session = None
+        # What can be seen from where, cached until the terrain around changes
+        self.fov = FieldOfView(self.grid)
+
+    # Returns the map's height
+    def height(self):
+        return self.grid.height
+
+    # Returns the map's width
+    def width(self):
+        return self.grid.width
+
+    # Renders the tileSet's numeric values into string characters, one string per row
+    def renderRows(self):
+        return [renderRow(self.grid.row(y)) for y in range(self.grid.height)]
+
+    # Prints the whole map at once
+    def renderMap(self):
+        print('\n'.join(self.renderRows()))
+
+    # Checks if the given coords are occupied by an entity in the map
+    def isOccupied(self, coords):
+        return self.grid.isOccupied(coords)
+
+    # Checks if there is anything other than empty spaces or "bedrock" in a 3x3 area
+    def surroundings(self, coords):
+        return self.grid.surroundings(coords)
+
+    # Plots the representation of the entity in the given coords (tuple)
+    def plot(self, coords, entityRep):
+        return self.grid.plot(coords, entityRep)
+
+    # Unplots whatever entity is at the given coords (tuple), the terrain underneath is kept
+    def unplot(self, coords):
+        return self.grid.unplot(coords)
+
+    # Changes the terrain at the given coords (tuple), and lets the flow fields know
+    def setTerrain(self, coords, code):
+        self.grid.setTerrain(coords, code)
+        for field in self.flowFields.values():
+            field.tileChanged(coords)
+        self.fov.tileChanged(coords)
+        if not self.isOccupied(coords):
+            self.spawner.cellFreed(coords)
+
+    # Returns the flow field leading to target, only built if there isn't one cached already
+    def flowField(self, target, maxDistance):
+        field = self.flowFields.get(target)
+        if field is None or field.maxDistance < maxDistance:
+            field = self.flowFields[target] = FlowField(self.grid, target, maxDistance)
+            if len(self.flowFields) > FLOW_FIELDS:
+                self.flowFields.popitem(last=False)
+        self.flowFields.move_to_end(target)
+        return field
+
+    # Returns the cells that can be seen from coords, walls blocking the view
+    def visible(self, coords, radius=SIGHT):
+        return self.fov.visible(coords, radius)
+
+    # Shortest path from start to goal around the walls of the map, for targets other than the player
+    def findPath(self, start, goal, maxNodes=None):
+        return findPath(self.grid, start, goal, maxNodes)
+
+    # Plots the entity at its coords and indexes it, returns whether it could be placed
+    def addEntity(self, entity):
+        if not self.plot(entity.coords, entity.rep):
+            return False
+        self.index.insert(entity)
+        entity.map = self
+        return True
+
+    # Unplots the entity and removes it from the index
+    def removeEntity(self, entity):
+        if self.index.remove(entity):
+            self.unplot(entity.coords)
+            self.spawner.cellFreed(entity.coords)
+        self.mobsInMap.pop(entity.ID, None)
+        self.spawner.removed(entity)
+        if entity.map is self:
+            entity.map = None
+        # Dead mobs are reused by later spawns instead of being thrown away
+        if entity.dead and isinstance(entity, Mob):
+            CONTENT.MOBS.recycle(entity, self.mobPool())
+
+    # Moves the entity to newCoords if they're free, returns whether it moved
+    def moveEntity(self, entity, newCoords):
+        if self.isOccupied(newCoords):
+            return False
+        oldCoords = entity.coords
+        self.unplot(oldCoords)
+        self.plot(newCoords, entity.rep)
+        self.index.move(entity, newCoords)
+        entity.coords = newCoords
+        self.spawner.cellFreed(oldCoords)
+        return True
+
+    # Returns the entity object standing at the given coords, or None
+    def entityAt(self, coords):
+        return self.index.at(coords)
+
+    # Returns the entity objects in the 3x3 area centered on coords, the center included
+    def entitiesAround(self, coords):
+        return self.index.inRange(coords[0]-1, coords[1]-1, coords[0]+1, coords[1]+1)
+
+    # Returns the entity objects within radius of the given coords
+    def entitiesNear(self, coords, radius):
+        return self.index.inRadius(coords, radius)
+
+    # Returns the mobs within radius of the given coords, namely the ones close enough to the player to act
+    def mobsNear(self, coords, radius):
+        return [e for e in self.index.inRadius(coords, radius) if e.ID in self.mobsInMap]
+
+    # Assigns an object to a representation on the map, namely mobs, built out of their registered type
+    def spawnMob(self, rep, coords):
+        pool = self.mobPool()
+        mob = CONTENT.MOBS.spawn(rep, coords, pool)
+        if mob is None:
+            return None
+        if self.addEntity(mob):
+            self.mobsInMap[mob.ID] = mob
+            return mob
+        CONTENT.MOBS.recycle(mob, pool)
+        return None
+
+    # Dead mobs the map's spawns reuse, its session's own so no other session ever gets them
+    def mobPool(self):
+        return self.session.mobPool if self.session is not None else CONTENT.MOBS.pool
+
+    # Adds the map's spawn zone, the whole map with the spawnable mobs picked evenly
+    def addSpawnZone(self):
+        return self.spawner.addZone(SpawnZone(self.name, [(rep, 1) for rep in self.spawnableMobs]))
+
+    # Spawns spawnSpots mobs anywhere in the map. It stops on its own when the map is full (see spawning.py)
+    def setSpawn(self):
+        if not self.spawnSet:
+            self.spawner.populate(self.addSpawnZone(), self.spawnSpots)
+        self.spawnSet = True
+
+
+# Characters keep their numbers in the entity store (see entities.py), only the rest lives in the object
+class Character(Entity):
+
+    __slots__ = ('name', 'skills', 'map')
+
+    def __init__(self, name, hp, mp, minAttack, maxAttack, coords, rep, skills=None):
+        # Global ID variable to keep track of Characters that would have the same name (i.e: Mob spawns)
+        global ID
+        Entity.__init__(self, ID)
+        ID += 1
+        self.minAttack = minAttack
+        self.maxAttack = maxAttack
+        self.hp = self.MAXHP = hp
+        self.mp = self.MAXMP = mp
+        self.name = name
+        self.dead = False
+        self.coords = coords
+        # Map the character is standing on, set when it's added to one
+        self.map = None
+        # Numerical representation on the tileSet
+        self.rep = rep
+        # Skills possessed by the character at instance creation time
+        self.skills = skills if skills is not None else []
+
+    # Very basic attack module, but works // TODO: Increase complexity
+    def attack(self, player, dmg=None):
+        if dmg == None:
+            dmg = random.randint(self.minAttack, self.maxAttack)
+        if self.hp <= 0:
+            eventsOf(self).emit(events.ACTOR_DEAD, self.name)
+        elif player.hp <= 0:
+            eventsOf(self).emit(events.WINNER, player.name, self.name)
+        else:
+            player.hp -= dmg
+            eventsOf(self).emit(events.ATTACK, self.name, player.name, dmg)
+            effectsOf(player).regen(player)
+
+    # Lets the character use Skill objects, and cast them on other Character entities/subclasses
+    def skill(self, skill, receiver):
+        for s in self.skills:
+            if s.name == skill:
+                s.cast(self, receiver)
+
+    # Checks if the entity's dead, and updates death-related variables
+    def checkDead(self):
+        if self.hp <= 0:
+            self.hp = 0
+            if not self.dead:
+                eventsOf(self).emit(events.DEATH, self.name)
+            self.dead = True
+
+    # Heals the character object to full health
+    def heal(self):
+        if not self.dead:
+            self.hp = self.MAXHP
+        else:
+            eventsOf(self).emit(events.CANT_HEAL, self.name)
+
+    # Revives the character
+    def revive(self):
+        self.dead = False
+
+    # Moves the character by the given offsets, on its own map (or the current one if it isn't on any)
+    def move(self, dx, dy):
+        MAP = self.map if self.map is not None else MAPLIST["Current"]
+        return MAP.moveEntity(self, (self.coords[0]+dx, self.coords[1]+dy))
+
+    # Moves the character upwards
+    def moveUp(self):
+        return self.move(0, -1)
+
+    # Moves the character downwards
+    def moveDown(self):
+        return self.move(0, 1)
+
+    # Moves the character to the left
+    def moveLeft(self):
+        return self.move(-1, 0)
+
+    # Moves the character to the right
+    def moveRight(self):
+        return self.move(1, 0)
+
+
+class Player(Character):
+
+    __slots__ = ('level', 'exp', 'minExp', 'progression', 'backpack')
+
+    def __init__(self, name, hp, mp, minAttack, maxAttack, coords, rep):
+        # Player objects share ID with Character object throught inheritance
+        Character.__init__(self, name, hp, mp, minAttack, maxAttack, coords, rep)
+        self.level = 1
+        self.exp = 0.0
+        # Experience and stats of every level, out of the starting stats (see progression.py)
+        self.progression = progressionFor(hp, mp, minAttack, maxAttack)
+        # Minimum exp required to level up
+        self.minExp = self.progression.minExp[1]
+        # The player benefits from a 12-slot backpack
+        self.backpack = Backpack(12)
+        # The backpack object is given an owner variable containing the player itself, to be able to go back to the caller
+        self.backpack.owner = self
+        # Skills the player possesses are the Character ones // TODO: Implement skill acquiring function
+
+    # Moves the player, keeping the part of the map around it in memory
+    def move(self, dx, dy):
+        moved = Character.move(self, dx, dy)
+        if moved:
+            self.map.grid.focus(self.coords)
+        return moved
+
+    # The function updates the character's variables regarding levels and experience // TODO: Increase complexity
+    def levelup(self):
+        self.exp -= self.minExp
+        self.progression.setLevel(self, self.level + 1)
+        effectsOf(self).reapply(self)
+
+    # Gives amount experience to the player, levelling it up as many times as it takes. Returns the amount of levels gained
+    def grantExp(self, amount):
+        levels = self.progression.grant(self, amount)
+        if levels:
+            # Level ups set the stats anew, the buffs going on are added back
+            effectsOf(self).reapply(self)
+            eventsOf(self).emit(events.LEVEL_UP, self.name, self.level)
+        return levels
+
+    # Checks if the player has leveled up, maybe more than once
+    def checkLevelup(self):
+        return self.grantExp(0.0)
+
+    # Displays the player's backpack // TODO: Implement for the GUI
+    def displayBackpack(self):
+        eventsOf(self).emit(events.MESSAGE, self.backpack.describe())
+
+
+# For defining Item objects, which would be held inside a Backpack object, and usable from within
+class Item():
+
+    def __init__(self, name, isUsable, effect=None):
+        # Global ID for Item objects, to keep track of them even if they have the same name
+        global ITEM_ID
+        self.ID = ITEM_ID
+        ITEM_ID += 1
+        self.name = name
+        self.effect = effect
+        self.isUsable = isUsable
+
+    # Uses the Item object itself, by calling the effect if it's usable
+    def use(self, owner):
+        if self.isUsable:
+            self.effect(owner)
+        else:
+            eventsOf(owner).emit(events.NOT_USABLE, self.name)
+
+# Backpack class to be used mainly inside the Player class, but could also be applied to any Character class/subclass instance
+class Backpack():
+
+    def __init__(self, slots):
+        self._reset(slots)
+        self.owner = None
+
+    # Empties the backpack down to the given amount of slots, its owner is left alone
+    def _reset(self, slots):
+        self.slots = slots
+        # ITEM_ID held by each slot (EMPTY_SLOT if none) and how many of it, every slot is independent
+        self.itemIDs = array('l', [EMPTY_SLOT])*slots
+        self.counts = array('l', [0])*slots
+        # ITEM_ID -> slot and item name -> slot, so items are found without walking the slots
+        self.byID = {}
+        self.byName = {}
+        # ITEM_ID -> Item object, for every item held
+        self.items = {}
+        # Free slots, the lowest one first
+        self.free = list(range(slots))
+        # Bumped on every change, so the description is only rebuilt when something changed
+        self.version = 0
+        self.described = (-1, '')
+
+    # The slots as [item, quantity] lists, [None, 0] for the empty ones
+    @property
+    def storage(self):
+        return [[self.items[i], n] if i != EMPTY_SLOT else [None, 0] for i, n in zip(self.itemIDs, self.counts)]
+
+    # Refills the backpack from (ITEM_ID, quantity) pairs, one per slot, items being the list of all items
+    def restore(self, slots, items):
+        self._reset(len(slots))
+        for slot, (itemID, quantity) in enumerate(slots):
+            if itemID != EMPTY_SLOT:
+                self._fill(slot, items[itemID], quantity)
+        self.free = [slot for slot, itemID in enumerate(self.itemIDs) if itemID == EMPTY_SLOT]
+
+    # Puts quantity of the item in the given slot, already taken out of the free slots
+    def _fill(self, slot, item, quantity):
+        self.itemIDs[slot] = item.ID
+        self.counts[slot] = quantity
+        self.byID[item.ID] = slot
+        self.byName.setdefault(item.name, slot)
+        self.items[item.ID] = item
+        self.version += 1
+
+    # Empties the given slot
+    def _clear(self, slot):
+        item = self.items.pop(self.itemIDs[slot])
+        del self.byID[item.ID]
+        if self.byName.get(item.name) == slot:
+            del self.byName[item.name]
+        self.itemIDs[slot] = EMPTY_SLOT
+        self.counts[slot] = 0
+        heapq.heappush(self.free, slot)
+        self.version += 1
+
+    # Returns how many of the given item (object or ITEM_ID) the backpack holds
+    def count(self, item):
+        slot = self.byID.get(getattr(item, 'ID', item))
+        return 0 if slot is None else self.counts[slot]
+
+    # Adds the item parameter quantity times, stacking it with the same item if it's already there
+    def add(self, item, quantity):
+        slot = self.byID.get(item.ID)
+        if slot is not None:
+            self.counts[slot] += quantity
+            self.version += 1
+            return True
+        if not self.free:
+            eventsOf(self.owner).emit(events.BACKPACK_FULL)
+            return False
+        self._fill(heapq.heappop(self.free), item, quantity)
+        return True
+
+    # Adds many (item, quantity) pairs at once, returns the pairs that didn't fit
+    def addMany(self, entries):
+        totals = Counter()
+        items = {}
+        for item, quantity in entries:
+            totals[item.ID] += quantity
+            items[item.ID] = item
+        left = []
+        for itemID, quantity in totals.items():
+            slot = self.byID.get(itemID)
+            if slot is not None:
+                self.counts[slot] += quantity
+            elif self.free:
+                self._fill(heapq.heappop(self.free), items[itemID], quantity)
+            else:
+                left.append((items[itemID], quantity))
+        self.version += 1
+        if left:
+            eventsOf(self.owner).emit(events.BACKPACK_FULL)
+        return left
+
+    # Removes whichever item is in the slot parameter by the quantity parameter
+    def remove(self, slot, quantity):
+        if self.itemIDs[slot] == EMPTY_SLOT:
+            return
+        if self.counts[slot] <= quantity:
+            self._clear(slot)
+        else:
+            self.counts[slot] -= quantity
+            self.version += 1
+
+    # Removes up to quantity of the given item (object or ITEM_ID), returns how many were removed
+    def removeItem(self, item, quantity):
+        slot = self.byID.get(getattr(item, 'ID', item))
+        if slot is None:
+            return 0
+        removed = min(quantity, self.counts[slot])
+        self.remove(slot, quantity)
+        return removed
+
+    # Removes many (item, quantity) pairs at once, returns ITEM_ID -> how many were removed
+    def removeMany(self, entries):
+        totals = Counter()
+        for item, quantity in entries:
+            totals[getattr(item, 'ID', item)] += quantity
+        return {itemID: self.removeItem(itemID, quantity) for itemID, quantity in totals.items()}
+
+    # Moves up to quantity of the item into another container, returns how many were moved
+    def transfer(self, other, item, quantity):
+        slot = self.byID.get(getattr(item, 'ID', item))
+        if slot is None:
+            return 0
+        item = self.items[self.itemIDs[slot]]
+        moved = min(quantity, self.counts[slot])
+        if not other.addMany([(item, moved)]):
+            self.remove(slot, moved)
+            return moved
+        return 0
+
+    # Moves everything into another container, returns the (item, quantity) pairs that didn't fit
+    def transferAll(self, other):
+        entries = [(self.items[i], n) for i, n in zip(self.itemIDs, self.counts) if i != EMPTY_SLOT]
+        left = other.addMany(entries)
+        kept = dict((item.ID, n) for item, n in left)
+        for item, quantity in entries:
+            self.removeItem(item, quantity - kept.get(item.ID, 0))
+        return left
+
+    # Uses the item by calling the Item.use() function, passing by the owner (the caller)
+    def use(self, itemName):
+        slot = self.byName.get(itemName)
+        if slot is None:
+            # The user doesn't have enough of the given item
+            eventsOf(self.owner).emit(events.NOT_ENOUGH)
+            return
+        self.items[self.itemIDs[slot]].use(self.owner)
+        # Reduces the amount of given item by 1, or deletes it completely if the stack only contains 1
+        self.remove(slot, 1)
+
+    # Sentence listing what's in the backpack, only rebuilt when the contents changed
+    def describe(self):
+        if self.described[0] != self.version:
+            held = ["%d %s"%(n, self.items[i].name) for i, n in zip(self.itemIDs, self.counts) if i != EMPTY_SLOT]
+            if held:
+                text = "You have %s items in your backpack"%", ".join(held)
+            else:
+                text = "You don't have any items in your backpack"
+            self.described = (self.version, text)
+        return self.described[1]
+
+# Mob class designed to represent enemies
+class Mob(Character):
+
+    __slots__ = ()
+
+    # The drop method, when the entity dies it may or may not drop an item depending on the DROPLIST // TODO: Drop item on the ground
+    def drop(self, killer):
+        drops = Counter(CONTENT.LOOT[self.name].roll())
+        if not drops:
+            return
+        # The dropped items are instantly added to the player's backpack, all at once
+        items = CONTENT.ITEMS
+        killer.backpack.addMany([(items[itemID], count) for itemID, count in drops.items()])
+        bus = eventsOf(killer)
+        for itemID, count in drops.items():
+            bus.emit(events.DROP, self.name, items[itemID].name, count)
+
+    # Searches for a player in a 3x3 area, and starts a battle against it
+    def detectPlayer(self):
+        for e in self.map.entitiesAround(self.coords):
+            if isinstance(e, Player) and not e.dead:
+                sessionOf(e).startBattle(e, self)
+                return
+
+    # Special checkDead method, if the enemy dies it deletes its instance from the map
+    def checkDead(self):
+        if self.hp <= 0:
+            self.hp = 0
+            if not self.dead:
+                eventsOf(self).emit(events.DEATH, self.name)
+            self.dead = True
+            if self.map is not None:
+                self.map.removeEntity(self)
+
+    # Follows the target around, descending the map's flow field towards it, so walls are walked around
+    def autoMove(self, target):
+        field = self.map.flowField(target.coords, AI_STEPS)
+        step = field.step(self.coords, self.map.isOccupied)
+        if step is not None:
+            self.map.moveEntity(self, step)
+
+    # Turns the mob into a brand new one of the given type at coords, keeping the object and its store slot.
+    # It gets a new ID all the same, so nothing mistakes it for the mob it used to be (i.e: save files)
+    def reset(self, mobType, coords):
+        global ID
+        self.ID = ID
+        ID += 1
+        self.name = mobType.name
+        self.rep = mobType.rep
+        self.hp = self.MAXHP = mobType.hp
+        self.mp = self.MAXMP = mobType.mp
+        self.minAttack = mobType.minAttack
+        self.maxAttack = mobType.maxAttack
+        self.dead = False
+        self.coords = coords
+        self.map = None
+        del self.skills[:]
+        return self
+
+# Prototype of a kind of mob, the stats every mob of the kind starts with
+class MobType():
+
+    __slots__ = ('name', 'rep', 'hp', 'mp', 'minAttack', 'maxAttack', 'glyph')
+
+    def __init__(self, name, rep, hp, mp, minAttack, maxAttack, glyph=None):
+        self.name = name
+        self.rep = rep
+        self.hp = hp
+        self.mp = mp
+        self.minAttack = minAttack
+        self.maxAttack = maxAttack
+        # Character the mob is drawn as, None to leave its tile code's glyph as it is
+        self.glyph = glyph
+
+# Every kind of mob, by representation and by name, along with a pool of dead mobs that spawns reuse
+class MobRegistry():
+
+    def __init__(self, poolSize=MOB_POOL):
+        self.byRep = {}
+        self.byName = {}
+        self.pool = []
+        self.poolSize = poolSize
+        # Mobs built from scratch and mobs taken out of the pool
+        self.created = 0
+        self.reused = 0
+
+    def __contains__(self, key):
+        return key in self.byRep or key in self.byName
+
+    def register(self, mobType):
+        if mobType.glyph is not None:
+            setGlyph(mobType.rep, mobType.glyph)
+        self.byRep[mobType.rep] = mobType
+        self.byName[mobType.name] = mobType
+        return mobType
+
+    # Returns the type with the given representation or name, None if there's none
+    def get(self, key):
+        mobType = self.byRep.get(key)
+        if mobType is None:
+            mobType = self.byName.get(key)
+        return mobType
+
+    # Returns a mob of the given type (rep or name) at coords, reused from pool (the registry's own by
+    # default) if there's one there
+    def spawn(self, key, coords, pool=None):
+        mobType = self.get(key)
+        if mobType is None:
+            return None
+        if pool is None:
+            pool = self.pool
+        if pool:
+            self.reused += 1
+            return pool.pop().reset(mobType, coords)
+        self.created += 1
+        return Mob(mobType.name, mobType.hp, mobType.mp, mobType.minAttack, mobType.maxAttack, coords, mobType.rep)
+
+    # Takes back a mob that's off every map for good into pool (the registry's own by default), which only
+    # keeps up to poolSize of them
+    def recycle(self, mob, pool=None):
+        if pool is None:
+            pool = self.pool
+        if len(pool) < self.poolSize:
+            pool.append(mob)
+
+# Battle between playerEnt and mobEnt, resolved one round per keypress. Instead of sleeping, it waits
+# for the clock to reach resumeAt, so the rest of the world keeps going while the outcome is on screen
+class Battle():
+
+    # Seconds the outcome of a round stays on screen
+    PAUSE = 3
+
+    def __init__(self, playerEnt, mobEnt):
+        self.playerEnt = playerEnt
+        self.mobEnt = mobEnt
+        self.resumeAt = 0.0
+        # Neither regenerates until the battle is over, the rounds play out as combat.fight() has them
+        effectsOf(playerEnt).hold(playerEnt)
+        effectsOf(mobEnt).hold(mobEnt)
+        # Either entity died, the post-battle executions are done
+        self.finished = False
+        # The post-battle pause is over as well, the battle can be discarded
+        self.over = False
+
+    # Lines displayed under the map while the battle goes on
+    def lines(self):
+        if self.finished:
+            return actionBar(1)
+        return actionBar(1) + ["Press A to attack"]
+
+    # Checks if the battle is still showing the outcome of the last round at the given time
+    def waiting(self, now):
+        return now < self.resumeAt
+
+    # Plays a round if the key is the attack key and the battle isn't waiting, returns whether it did
+    def handleKey(self, key, now):
+        if self.finished or self.waiting(now) or key.lower() != "a":
+            return False
+        self.playerEnt.attack(self.mobEnt)
+        self.mobEnt.attack(self.playerEnt)
+        self.resumeAt = now + self.PAUSE
+        return True
+
+    # Moves the battle forward once the pause is over
+    def update(self, now):
+        if self.waiting(now):
+            return
+        if self.finished:
+            self.over = True
+        elif self.playerEnt.hp <= 0 or self.mobEnt.hp <= 0:
+            self.finish()
+            self.resumeAt = now + self.PAUSE
+
+    # Post-battle executions, game over or xp gain, drops and levelup check
+    def finish(self):
+        playerEnt, mobEnt = self.playerEnt, self.mobEnt
+        if playerEnt.hp <= 0:
+            # If at the end of the battle, the player's hp is null, then the player has died. Game over.
+            eventsOf(playerEnt).emit(events.GAME_OVER)
+        else:
+            xp = expReward(CONTENT.EXPTABLE, mobEnt.name, playerEnt.level, random.random())
+            eventsOf(playerEnt).emit(events.KILL, mobEnt.name, xp)
+            mobEnt.drop(playerEnt)
+            playerEnt.grantExp(xp)
+        # The sweep leaves fighting entities alone, the mob is only taken off its map and recycled here
+        playerEnt.checkDead()
+        mobEnt.checkDead()
+        effectsOf(playerEnt).release(playerEnt)
+        effectsOf(mobEnt).release(mobEnt)
+        self.finished = True
+
+# Everything a single player plays in: its player, its maps, its battle and its screen. The local game
+# is one session, and the server (see server.py) runs one per connection, none of them sharing a thing
+class Session():
+
+    def __init__(self, playerEnt, maps, entities=None, out=None):
+        self.player = playerEnt
+        # Maps by name, "Current" being an alias of the one the player is on (same layout as MAPLIST)
+        self.maps = maps
+        # Players of the session
+        self.entities = entities if entities is not None else [playerEnt]
+        # Battle going on, if any
+        self.battle = None
+        # Simulation of the maps the player isn't on, None to leave them as they are
+        self.world = None
+        # Keeps track of what's on the session's screen, so each frame only sends what changed
+        self.renderer = Renderer(out)
+        # Part of the current map drawn on screen, around the player
+        self.camera = Camera()
+        # Last messages printed by the game, drawn under the map
+        self.messages = MessageLog()
+        # Dead mobs of the session's maps, reused by their spawns
+        self.mobPool = []
+        # What happens to the session's player, written to the message log once per frame
+        self.events = EventBus()
+        self.events.subscribe(MessageSink(self.messages))
+        # Cooldowns, effects over time, buffs and regeneration of the session's entities
+        self.effects = EffectScheduler()
+        # Ticks the session's own systems, the loop itself is run by whoever hosts the session
+        self.scheduler = Scheduler(TICK_RATE, FRAME_RATE, profiler=PROFILER)
+        self.scheduler.addSystem("battle", self.updateBattle)
+        self.scheduler.addSystem("mobs", self.updateMobs, MOB_STEP)
+        self.scheduler.addSystem("spawns", self.updateSpawns)
+        self.scheduler.addSystem("effects", self.updateEffects)
+        self.scheduler.onKey(lambda key: self.handleKey(key, self.scheduler.now))
+        self.scheduler.onRender(self.updateScreen)
+        self.bind()
+        SESSIONS.append(self)
+
+    # Makes every map of the session start its battles in it, needed again whenever maps are replaced
+    def bind(self):
+        for m in self.allMaps():
+            m.session = self
+
+    # Returns every map of the session once, "Current" being an alias of one of the others
+    def allMaps(self):
+        maps = {}
+        for m in self.maps.values():
+            maps[m.ID] = m
+        return list(maps.values())
+
+    # Takes everything off the session's maps and forgets about the session, so its entities are freed
+    def close(self):
+        for m in self.allMaps():
+            for e in list(m.index.entities.values()):
+                m.removeEntity(e)
+            m.session = None
+        self.battle = None
+        if self in SESSIONS:
+            SESSIONS.remove(self)
+
+    # Hands every map but the current one to the world simulation, and runs it every COARSE_STEP seconds
+    def simulate(self, world):
+        self.world = world
+        for m in self.allMaps():
+            if m is not self.maps["Current"]:
+                world.track(m)
+        from .worldsim import COARSE_STEP
+        self.scheduler.addSystem("world", world.update, COARSE_STEP)
+
+    # Takes the player to the map called name, at coords, returns whether it got there. The map is brought
+    # up to date by the world simulation before being entered, and the one left behind is handed to it
+    def travel(self, name, coords):
+        player = self.player
+        old, new = self.maps["Current"], self.maps[name]
+        if self.battle is not None or new is old:
+            return False
+        if self.world is not None:
+            self.world.release(new)
+        oldCoords = player.coords
+        old.removeEntity(player)
+        player.coords = coords
+        if not new.addEntity(player):
+            player.coords = oldCoords
+            old.addEntity(player)
+            if self.world is not None:
+                self.world.track(new)
+            return False
+        self.maps["Current"] = new
+        new.grid.focus(coords)
+        new.setSpawn()
+        if self.world is not None:
+            self.world.track(old)
+        return True
+
+    # Starts a battle between playerEnt and mobEnt, unless there's one going on already
+    def startBattle(self, playerEnt, mobEnt):
+        if self.battle is None:
+            self.battle = Battle(playerEnt, mobEnt)
+
+    # Moves the current battle forward, and discards it once it's over
+    def updateBattle(self, now, dt):
+        fight = self.battle
+        if fight is not None:
+            fight.update(now)
+            if fight.over:
+                self.battle = None
+
+    # Wakes up the mobs close to the session's players, only the mob being fought stays put. Mobs a
+    # player can't see can't be next to it either, so they don't bother looking for it. A mob close to
+    # several players only wakes up for the first one
+    def updateMobs(self, now, dt):
+        currentMap = self.maps["Current"]
+        awake = set()
+        for player in self.entities:
+            if player.map is not currentMap:
+                continue
+            mobs = currentMap.mobsNear(player.coords, AI_RADIUS)
+            visible = currentMap.visible(player.coords)
+            PROFILER.count("mobs_updated", len(mobs))
+            for mob in mobs:
+                fight = self.battle
+                if mob.dead or mob.ID in awake or (fight is not None and fight.mobEnt is mob):
+                    continue
+                awake.add(mob.ID)
+                if mob.coords in visible:
+                    mob.detectPlayer()
+                fight = self.battle
+                if not mob.dead and (fight is None or fight.mobEnt is not mob):
+                    mob.autoMove(player)
+
+    # Respawns the mobs of the current map whose time came
+    def updateSpawns(self, now, dt):
+        self.maps["Current"].spawner.update(now)
+
+    # Applies the timed effects whose time came
+    def updateEffects(self, now, dt):
+        self.effects.update(now)
+
+    # Handles a key pressed by the user, it goes to the battle if there's one, and moves the player otherwise
+    def handleKey(self, key, now):
+        fight = self.battle
+        if fight is not None:
+            fight.handleKey(key, now)
+        else:
+            key = ARROWS.get(key, key.lower())
+            if key == "w":
+                self.player.moveUp()
+            elif key == "s":
+                self.player.moveDown()
+            elif key == "a":
+                self.player.moveLeft()
+            elif key == "d":
+                self.player.moveRight()
+
+    # Draws the GUI elements, the current map and any extra lines under it, only changed cells reach the screen
+    def updateScreen(self, extra=None):
+        lines = self.statusBar()
+        currentMap, coords = self.maps["Current"], self.player.coords
+        lines.extend(self.camera.render(currentMap, coords, currentMap.visible(coords)))
+        if extra is None and self.battle is not None:
+            extra = self.battle.lines()
+        if extra:
+            lines.extend(extra)
+        self.events.flush()
+        lines.extend(self.messages.lines())
+        self.renderer.draw(lines)
+        PROFILER.count("tiles_redrawn", self.renderer.cellsDrawn)
+        PROFILER.count("bytes_written", self.renderer.bytesWritten)
+
+    # Bar displaying HP, MP, Level and Experience values for the player, and the frame times while profiling
+    def statusBar(self):
+        player = self.player
+        bar = ["##########################################",
+               "# HP: %00d # MP: %d ## Lvl: %d # XP: %.2f #"%(player.hp, player.mp, player.level, player.exp),
+               "##########################################"]
+        if PROFILER.enabled:
+            bar.append(PROFILER.statusLine(("tick", "frame", "mobs")))
+        return bar
+
+##########################
+###      Content       ###
+##########################
+
+# Content tables and the objects built out of them, nothing is read from the data file (see content.py)
+# until one of them is first used, so importing the game stays cheap
+class Content():
+
+    NAMES = ('DROPLIST', 'LOOT', 'EXPTABLE', 'MOBS', 'ITEMS', 'SKILLS', 'MAPS', 'TILESETS', 'PLAYER')
+
+    def __init__(self, path=None):
+        self.path = path
+
+    # Only called for attributes that aren't set, i.e: the tables before they're loaded
+    def __getattr__(self, name):
+        if name not in Content.NAMES:
+            raise AttributeError(name)
+        self.load()
+        return self.__dict__[name]
+
+    def load(self):
+        tables = content.load(self.path)
+        # Keeps track of what each mob drops, at what rate (see loot.py), and its compiled tables
+        self.DROPLIST = tables['droplist']
+        self.LOOT = loot.compileDroplist(self.DROPLIST)
+        # Experience given by each mob
+        self.EXPTABLE = tables['exptable']
+        # Every kind of mob
+        self.MOBS = MobRegistry()
+        for rep, (name, hp, mp, minAttack, maxAttack, glyph) in tables['mobs'].items():
+            self.MOBS.register(MobType(name, rep, hp, mp, minAttack, maxAttack, glyph))
+        # Every item and skill, by ID
+        self.ITEMS = [Item(name, usable, EFFECTS[effect]) for name, usable, effect in tables['items']]
+        self.SKILLS = [Skill(name, EFFECTS[effect], mpCost, requiredLevel, cooldown) for name, effect, mpCost, requiredLevel, cooldown in tables['skills']]
+        self.MAPS = tables['maps']
+        # Terrain of every map, shared by all the Map objects built from it until they modify it
+        self.TILESETS = dict((name, Tileset(m['width'], m['height'], m['terrain'])) for name, m in self.MAPS.items())
+        self.PLAYER = tables['player']
+
+CONTENT = Content()
+
+# Content tables are reachable as module attributes too (i.e: Game.ITEMS), loaded on first access
+def __getattr__(name):
+    if name in Content.NAMES:
+        return getattr(CONTENT, name)
+    raise AttributeError("module %r has no attribute %r"%(__name__, name))
+
+##########################
+###       Globals      ###
+##########################
+
+# The local game's player, its entities and its maps, set by newGame()
+player = None
+ENTITYLIST = []
+MAPLIST = {}
+
+##########################
+###       Screen       ###
+##########################
+
+# Save file written by the autosave, whole the first time and only the changes afterwards
+SAVE = savegame.SaveFile(SAVE_PATH)
+# Times each phase of the game loop, close to free while disabled
+PROFILER = Profiler(enabled=bool(PROFILE_PATH))
+# Every open session
+SESSIONS = []
+# Session of the local game, played on the terminal, set by newGame()
+SESSION = None
+# Events of entities outside of any session, nobody listens to them
+EVENTS = EventBus()
+EVENTS.subscribe(NullSink())
+# Timed effects of entities outside of any session, nothing ever ticks them
+TIMED_EFFECTS = EffectScheduler()
+        
+##########################
+###     Functions      ###
+##########################
+
+# Session the entity plays in, the local one for entities outside of any session's maps
+def sessionOf(entity):
+    if entity.map is not None and entity.map.session is not None:
+        return entity.map.session
+    return SESSION
+
+# Event bus of the session the entity plays in (see events.py)
+def eventsOf(entity):
+    session = sessionOf(entity) if entity is not None else SESSION
+    return session.events if session is not None else EVENTS
+
+# Effect scheduler of the session the entity plays in (see effects.py)
+def effectsOf(entity):
+    session = sessionOf(entity) if entity is not None else SESSION
+    return session.effects if session is not None else TIMED_EFFECTS
+
+# Battle between playerEnt and mobEnt until either of the entities dies, blocking until it's over
+# getKey and wait default to the keyboard and to sleeping, both can be replaced to run it headless
+def battle(playerEnt, mobEnt, getKey=getch, wait=time.sleep):
+    session = sessionOf(playerEnt)
+    fight = Battle(playerEnt, mobEnt)
+    now = 0.0
+    while True:
+        fight.update(now)
+        if fight.over:
+            break
+        if fight.waiting(now):
+            wait(fight.resumeAt - now)
+            now = fight.resumeAt
+        else:
+            session.updateScreen(fight.lines())
+            while not fight.handleKey(getKey(), now):
+                pass
+    session.updateScreen()
+
+# New Map object for the map called name in the content
+def newMap(name):
+    info = CONTENT.MAPS[name]
+    return Map(name, TileGrid(CONTENT.TILESETS[name]), info['spawnSpots'], info['spawnableMobs'])
+
+# New session for a player called name, alone on a map of its own, drawing on out
+def newSession(name, out=None):
+    stats = CONTENT.PLAYER
+    playerEnt = Player(name, stats['hp'], stats['mp'], stats['minAttack'], stats['maxAttack'], tuple(stats['coords']), stats['rep'])
+    m = newMap("Main")
+    session = Session(playerEnt, {"Current": m, "Main": m}, out=out)
+    m.addEntity(playerEnt)
+    m.grid.focus(playerEnt.coords)
+    m.setSpawn()
+    return session
+
+# Adds a new kind of mob, which can be spawned straight away. drops holds droplist entries (see
+# loot.py), i.e: (item, rate) pairs, items being given as Item objects, names or IDs. glyph is the
+# character it's drawn as, without one it shows as render.UNKNOWN
+def registerMob(name, rep, hp, mp, minAttack, maxAttack, exp=0.0, drops=(), glyph=None):
+    if not 0 < rep < 256:
+        raise ValueError("Mob representations are tile codes, from 1 to 255")
+    if glyph is not None:
+        checkGlyph(glyph)
+    # Floor tiles and the player's code can't be told apart from a mob on the map
+    if rep in WALKABLE or rep == CONTENT.PLAYER['rep']:
+        raise ValueError("Tile code %d is reserved"%rep)
+    taken = CONTENT.MOBS.get(rep) or CONTENT.MOBS.get(name)
+    if taken is not None:
+        raise ValueError("There's a mob called %s with tile code %d already"%(taken.name, taken.rep))
+    items = CONTENT.ITEMS
+    itemIDs = dict((item.name, i) for i, item in enumerate(items))
+    def itemID(item):
+        if isinstance(item, Item):
+            return items.index(item)
+        return item if isinstance(item, int) else itemIDs[item]
+    droplist = [loot.resolveEntry(entry, itemID) for entry in drops]
+    CONTENT.DROPLIST[name] = droplist
+    CONTENT.LOOT[name] = loot.compileEntries(droplist)
+    CONTENT.EXPTABLE[name] = exp
+    return CONTENT.MOBS.register(MobType(name, rep, hp, mp, minAttack, maxAttack, glyph))
+
+# Items dropped by n kills of mob (a Mob, a MobType or a mob's name) as ITEM_ID -> count, rolled in one go
+def rollMany(mob, n, rng=random):
+    return CONTENT.LOOT[getattr(mob, 'name', mob)].rollMany(n, rng)
+
+# Builds the local game, a session played on the terminal whose player and maps are the module's globals
+def newGame():
+    global SESSION, player, ENTITYLIST, MAPLIST
+    if SESSION is not None:
+        SESSION.close()
+    SESSION = newSession(CONTENT.PLAYER['name'])
+    player, ENTITYLIST, MAPLIST = SESSION.player, SESSION.entities, SESSION.maps
+    return SESSION
+
+# Writes a snapshot of the world into the save file, only what changed since the last one. Maps simulated
+# off-screen are saved as of their last coarse update read back, the workers are never waited on
+def saveGame(saveFile=SAVE):
+    if saveFile.snapshots >= savegame.COMPACT_AFTER:
+        saveFile.compact()
+    maps = SESSION.allMaps()
+    entities = [(e, True) for e in ENTITYLIST]
+    for m in maps:
+        entities.extend((mob, False) for mob in m.mobsInMap.values())
+    return saveFile.save((ID, ITEM_ID, SKILL_ID, MAP_ID), maps, entities, MAPLIST["Current"], player)
+
+# Replaces the world with the one in the save file at path, without spawning anything anew
+def loadGame(path):
+    global ID, ITEM_ID, SKILL_ID, MAP_ID, player
+    data = savegame.load(path)
+    maps = {}
+    for info in data.maps.values():
+        if info['chunkFile']:
+            chunkFile = ChunkFile(info['chunkFile'])
+            # Back to the terrain the world had when it was saved
+            for (cx, cy), terrain in info['chunks'].items():
+                chunkFile.write(cx, cy, terrain)
+            grid = ChunkedGrid(chunkFile)
+        else:
+            grid = TileGrid(Tileset(info['width'], info['height'], info['terrain']))
+        m = Map(info['name'], grid, info['spawnSpots'], info['spawnableMobs'])
+        m.ID = info['ID']
+        m.spawnSet = info['spawnSet']
+        maps[m.ID] = m
+    entities = {}
+    for e in data.entities.values():
+        coords = (e['x'], e['y'])
+        if e['kind'] == savegame.PLAYER_KIND:
+            ent = Player(e['name'], e['MAXHP'], e['MAXMP'], e['minAttack'], e['maxAttack'], coords, e['rep'])
+            ent.level, ent.exp, ent.minExp = e['level'], e['exp'], e['minExp']
+            # Stats keep growing out of the starting ones, not out of the saved ones
+            stats = CONTENT.PLAYER
+            ent.progression = progressionFor(stats['hp'], stats['mp'], stats['minAttack'], stats['maxAttack'])
+            ent.backpack.restore(e['backpack'], CONTENT.ITEMS)
+            ent.skills = [CONTENT.SKILLS[i] for i in e['skills']]
+        else:
+            ent = Mob(e['name'], e['MAXHP'], e['MAXMP'], e['minAttack'], e['maxAttack'], coords, e['rep'])
+        ent.ID = e['ID']
+        ent.hp, ent.mp, ent.dead = e['hp'], e['mp'], e['dead']
+        entities[ent.ID] = ent
+        m = maps.get(e['map'])
+        if m is not None:
+            m.addEntity(ent)
+            if isinstance(ent, Mob):
+                m.mobsInMap[ent.ID] = ent
+    ID, ITEM_ID, SKILL_ID, MAP_ID = data.counters
+    player = entities[data.player]
+    ENTITYLIST[:] = [e for e in entities.values() if isinstance(e, Player)]
+    # Chunk files of the world replaced are closed, what wasn't saved of it is dropped
+    for m in SESSION.allMaps():
+        if getattr(m.grid, 'file', None) is not None:
+            m.grid.file.close()
+    MAPLIST.clear()
+    for m in maps.values():
+        MAPLIST[m.name] = m
+        # The mobs of maps that were spawned belong to the map's zone again, for its cap and respawns
+        if m.spawnSet:
+            zone = m.addSpawnZone()
+            for mob in m.mobsInMap.values():
+                m.spawner.adopt(zone, mob)
+    MAPLIST["Current"] = maps[data.currentMap]
+    SESSION.player = player
+    SESSION.bind()
+
+# Flags every entity whose HP dropped to 0 as dead in a single sweep of the store, and takes dead mobs off their
+# maps. Entities in a battle are left to it, it finishes with them once its outcome is shown
+def sweepDead(now, dt):
+    fighting = set()
+    for session in SESSIONS:
+        fight = session.battle
+        if fight is not None and not fight.finished:
+            fighting.add(fight.playerEnt.ID)
+            fighting.add(fight.mobEnt.ID)
+    dead = STORE.sweepDead(fighting)
+    if dead:
+        for session in SESSIONS:
+            for m in session.allMaps():
+                for mobID in dead:
+                    mob = m.mobsInMap.get(mobID)
+                    if mob is not None:
+                        eventsOf(mob).emit(events.DEATH, mob.name)
+                        m.removeEntity(mob)
+
+# Saves the game every AUTOSAVE seconds
+def autosave(now, dt):
+    PROFILER.count("bytes_saved", saveGame())
+
+# Dumps the profiler's numbers every PROFILE_DUMP seconds
+def dumpProfile(now, dt):
+    PROFILER.dump(PROFILE_PATH)
+
+# Lines of the action bar for the given state (0: out of battle, 1: combat)
+def actionBar(state, *args):
+    
+##    actionBar_OuttaBattle = ["##########################################",
+##                             "# %-*s #"%(38, args[1]),
+##                             "##########################################"]
+##    actionBar_Backpack = ["##########################################",
+##                          "# (%d) %-*s## (%d) %-*s #"%(args[0][0], 13, args[0][1], args[1][0], 13, args[1][1]),
+##                          "# (%d) %-*s## (%d) %-*s #"%(args[2][0], 13, args[2][1], args[3][0], 13, args[3][1]),
+##                          "# (%d) %-*s## (%d) %-*s #"%(args[4][0], 13, args[4][1], args[5][0], 13, args[5][1]),
+##                          "# (%d) %-*s## (%d) %-*s #"%(args[6][0], 13, args[6][1], args[7][0], 13, args[7][1]),
+##                          "# (%d) %-*s## (%d) %-*s #"%(args[8][0], 13, args[8][1], args[9][0], 13, args[9][1]),
+##                          "# (%d) %-*s## (%d) %-*s #"%(args[10][0], 13, args[10][1], args[11][0], 13, args[11][1]),
+##                          "##########################################"]
+    actionBar_Combat = ["##########################################"]
+
+    if state == 0:
+        return list(actionBar_OuttaBattle)
+    elif state == 1:
+        return list(actionBar_Combat)
+    return []
+        
+
+# Main game loop
+def main():
+    recorder = None
+    if RECORD_PATH:
+        # Recorded games start from scratch with a known seed, and leave the save file alone
+        from .replay import Recorder
+        recorder = Recorder(RECORD_PATH, TICK_RATE)
+        random.seed(recorder.seed)
+    newGame()
+    if recorder is None and os.path.exists(SAVE_PATH):
+        # Picks up where the last session left off
+        loadGame(SAVE_PATH)
+    currentMap = MAPLIST["Current"]
+    currentMap.grid.focus(player.coords)
+    currentMap.setSpawn()
+    # The world ticks on its own, keys and frames are handled whenever they come
+    scheduler = SESSION.scheduler
+    scheduler.addSystem("deaths", sweepDead, MOB_STEP)
+    if recorder is not None:
+        # Off-screen maps are left frozen as well, worker processes aren't replayed
+        recorder.attach(SESSION)
+    else:
+        scheduler.addSystem("autosave", autosave, AUTOSAVE)
+    if PROFILER.enabled:
+        scheduler.addSystem("profile", dumpProfile, PROFILE_DUMP)
+    if WORLD_WORKERS and recorder is None:
+        # Only imported when used, multiprocessing takes a while to import
+        from .worldsim import WorldSim
+        SESSION.simulate(WorldSim(WORLD_WORKERS))
+    eventLog = SESSION.events.subscribe(FileSink(EVENTS_PATH)) if EVENTS_PATH else None
+    # Anything printed by the game goes to the message log instead of over the frame
+    try:
+        with NonBlockingInput() as keys, redirect_stdout(SESSION.messages):
+            scheduler.run(keys)
+    except KeyboardInterrupt:
+        # Ctrl-C quits, the terminal was put back to normal when leaving the with block
+        pass
+    finally:
+        if recorder is not None:
+            recorder.close(scheduler.ticks)
+        if SESSION.world is not None:
+            SESSION.world.close()
+        if PROFILER.enabled:
+            PROFILER.dump(PROFILE_PATH)
+        if eventLog is not None:
+            SESSION.events.flush()
+            eventLog.close()
+
+if __name__ == "__main__":
+    main()
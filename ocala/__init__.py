@@ -0,0 +1,9 @@
+##########################
+### The Story of Ocala ###
+##########################
+
+# Console-driven game, only using the standard library. Importing the package is cheap: the game is
+# in ocala.Game, its content is only read once it's needed, and nothing is built until newGame(),
+# or main(), which is what "python -m ocala" runs
+
+__version__ = """0.5"""
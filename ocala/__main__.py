@@ -0,0 +1,5 @@
+# Entry point of "python -m ocala"
+
+from .Game import main
+
+main()
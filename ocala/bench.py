@@ -0,0 +1,237 @@
+##########################
+###     Benchmarks     ###
+##########################
+
+# Times the hot paths of the game on seeded, reproducible scenarios. Map sizes and mob counts grow
+# with --scale. Results are written as JSON, and can be compared against a stored baseline:
+#
+#   python -m ocala.bench --output bench.json                      # run and write the results
+#   python -m ocala.bench --baseline bench.json --threshold 0.1    # fail if anything got >10% slower
+#
+# Every scenario is run --repeat times and the median is reported, along with the fastest run
+
+import argparse
+import io
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from contextlib import redirect_stdout
+
+from . import Game
+
+# Scenarios, filled by the scenario decorator: name -> function(scale) returning (run, ops)
+SCENARIOS = {}
+
+def scenario(name):
+    def register(build):
+        SCENARIOS[name] = build
+        return build
+    return register
+
+# Tileset of the given size, floor surrounded by bedrock
+def tileset(width, height):
+    wall = [0]*width
+    floor = [0] + [1]*(width-2) + [0]
+    return [wall] + [floor]*(height-2) + [wall]
+
+# Map with the player in the middle and mobs spawned anywhere
+def world(width, height, mobs):
+    m = Game.Map("Bench", tileset(width, height), mobs, [100, 101])
+    p = Game.Player("Bench", 500, 500, 10, 15, (width//2, height//2), 2)
+    m.addEntity(p)
+    m.setSpawn()
+    return m, p
+
+##########################
+###     Scenarios      ###
+##########################
+
+@scenario("Map.renderMap")
+def renderMap(scale):
+    m, p = world(80*scale, 40*scale, 50*scale)
+    def run():
+        with redirect_stdout(io.StringIO()):
+            m.renderMap()
+    return run, 1
+
+@scenario("Camera.render")
+def cameraRender(scale):
+    m, p = world(400*scale, 400*scale, 2000*scale)
+    camera = Game.Camera()
+    def run():
+        # Same position every time, only the first field of view is computed
+        for i in range(100):
+            camera.render(m, p.coords, m.visible(p.coords))
+    return run, 100
+
+@scenario("Map.setSpawn")
+def setSpawn(scale):
+    rows = tileset(100*scale, 100*scale)
+    mobs = 500*scale
+    def run():
+        m = Game.Map("Bench", rows, mobs, [100, 101])
+        m.setSpawn()
+    return run, mobs
+
+@scenario("Map.surroundings")
+def surroundings(scale):
+    m, p = world(100*scale, 100*scale, 500*scale)
+    coords = [(random.randint(1, m.width()-2), random.randint(1, m.height()-2)) for _ in range(10000)]
+    def run():
+        for c in coords:
+            m.surroundings(c)
+    return run, len(coords)
+
+@scenario("Mob.autoMove")
+def autoMove(scale):
+    mobs = 200*scale
+    worlds = []
+    def run():
+        # Worlds are built by setup() before each run, so every run starts with the mobs spread out
+        p, chasing = worlds.pop()
+        for mob in chasing:
+            mob.autoMove(p)
+    def setup():
+        m, p = world(60*scale, 60*scale, mobs)
+        worlds.append((p, list(m.mobsInMap.values())))
+    run.setup = setup
+    return run, mobs
+
+@scenario("Mob.checkDead")
+def checkDead(scale):
+    rows = tileset(100*scale, 100*scale)
+    mobs = 500*scale
+    maps = []
+    def run():
+        # Maps are built by setup() before each run, only the removals are timed
+        m = maps.pop()
+        for mob in list(m.mobsInMap.values()):
+            mob.hp = 0
+            mob.checkDead()
+    def setup():
+        m = Game.Map("Bench", rows, mobs, [100, 101])
+        m.setSpawn()
+        maps.append(m)
+    run.setup = setup
+    return run, mobs
+
+@scenario("Backpack.add/use")
+def backpack(scale):
+    owner = Game.Player("Bench", 500, 500, 10, 15, (1, 1), 2)
+    items = Game.ITEMS
+    uses = 1000*scale
+    def run():
+        pack = Game.Backpack(12)
+        pack.owner = owner
+        with redirect_stdout(io.StringIO()):
+            for i in range(uses):
+                pack.add(items[i % len(items)], 1)
+            for i in range(uses):
+                pack.use(items[i % len(items)].name)
+    return run, 2*uses
+
+@scenario("battle")
+def battle(scale):
+    fights = 20*scale
+    players = []
+    def run():
+        # A fresh player every run, one levelled up by the previous runs would win faster
+        p = players.pop()
+        with redirect_stdout(io.StringIO()):
+            for i in range(fights):
+                mob = Game.Mob("Goblin", 75, 10, 1, 25, (1, 1), 101)
+                p.hp = p.MAXHP
+                Game.battle(p, mob, getKey=lambda: "a", wait=lambda seconds: None)
+    def setup():
+        m, p = world(40, 20, 0)
+        players.append(p)
+    run.setup = setup
+    return run, fights
+
+@scenario("rollMany")
+def rollMany(scale):
+    kills = 10000*scale
+    def run():
+        Game.rollMany("Goblin", kills)
+    return run, kills
+
+##########################
+###       Runner       ###
+##########################
+
+# Runs the named scenario repeat times, returns its timings
+def measure(name, scale, repeat, seed):
+    random.seed(seed)
+    run, ops = SCENARIOS[name](scale)
+    setup = getattr(run, 'setup', None)
+    times = []
+    # The game draws on the terminal, it draws into a throwaway buffer instead
+    Game.SESSION.renderer.out = io.StringIO()
+    for i in range(repeat):
+        random.seed(seed + i)
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+        Game.SESSION.renderer.out = io.StringIO()
+    median = statistics.median(times)
+    return {'seconds': median,
+            'min': min(times),
+            'ops': ops,
+            'perOp': median/ops,
+            }
+
+# Scenarios whose median got slower than the baseline by more than threshold (i.e: 0.1 for 10%)
+def regressions(results, baseline, threshold):
+    slower = {}
+    for name, result in results['results'].items():
+        old = baseline['results'].get(name)
+        if old is None or old['perOp'] <= 0:
+            continue
+        ratio = result['perOp']/old['perOp']
+        if ratio > 1 + threshold:
+            slower[name] = ratio
+    return slower
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks the hot paths of The Story of Ocala")
+    parser.add_argument('--scale', type=int, default=1, help="multiplies map sizes and mob counts")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--only', action='append', help="runs only the given scenarios")
+    parser.add_argument('--output', help="writes the results to this JSON file")
+    parser.add_argument('--baseline', help="compares the results against this JSON file")
+    parser.add_argument('--threshold', type=float, default=0.1, help="slowdown allowed before failing")
+    args = parser.parse_args(argv)
+    # The battle scenario draws on the local game's screen
+    Game.newGame()
+
+    results = {'meta': {'python': platform.python_version(),
+                        'scale': args.scale,
+                        'repeat': args.repeat,
+                        'seed': args.seed,
+                        },
+               'results': {},
+               }
+    for name in args.only or SCENARIOS:
+        result = results['results'][name] = measure(name, args.scale, args.repeat, args.seed)
+        print("%-20s %10.3f ms  %10.3f us/op"%(name, result['seconds']*1e3, result['perOp']*1e6))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        slower = regressions(results, baseline, args.threshold)
+        for name, ratio in sorted(slower.items()):
+            print("REGRESSION %s is %.2fx slower than the baseline"%(name, ratio))
+        if slower:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,43 @@
+##########################
+###       Camera       ###
+##########################
+
+# Window of the map drawn on screen, following the player around. Only the tiles inside the window are
+# read, and only the entities the player can see are drawn over them, so drawing a frame costs the same
+# on a tiny map as on one streamed from disk
+
+from .render import renderRow
+
+# Size of the window, in tiles
+VIEW_WIDTH = 60
+VIEW_HEIGHT = 20
+
+
+class Camera():
+
+    def __init__(self, width=VIEW_WIDTH, height=VIEW_HEIGHT):
+        self.width = width
+        self.height = height
+
+    # Top-left corner of the window centered on coords, moved back inside the map near its edges
+    def origin(self, grid, coords):
+        x0 = min(max(0, coords[0] - self.width//2), max(0, grid.width - self.width))
+        y0 = min(max(0, coords[1] - self.height//2), max(0, grid.height - self.height))
+        return x0, y0
+
+    # Tile codes of the window around coords, one bytearray per row. Entities are drawn over the terrain
+    # if they're in visible (any set of cells), or all of them if it's None
+    def codes(self, m, coords, visible=None):
+        grid = m.grid
+        x0, y0 = self.origin(grid, coords)
+        x1 = min(grid.width, x0 + self.width)
+        y1 = min(grid.height, y0 + self.height)
+        rows = [grid.terrainSpan(y, x0, x1) for y in range(y0, y1)]
+        for e in m.index.inRange(x0, y0, x1-1, y1-1):
+            if visible is None or e.coords in visible:
+                rows[e.coords[1] - y0][e.coords[0] - x0] = e.rep
+        return rows
+
+    # The window around coords as strings, ready to be drawn
+    def render(self, m, coords, visible=None):
+        return [renderRow(row) for row in self.codes(m, coords, visible)]
@@ -0,0 +1,285 @@
+##########################
+###   Chunked Worlds   ###
+##########################
+
+# Storage for worlds too big to be kept in memory. The terrain lives on disk, split in square
+# chunks, and is accessed through mmap. Only the chunks being used are copied into memory, and the
+# least recently used ones are evicted once there are more than maxResident. Modified chunks are
+# only written back by flush(), the ones evicted before that are set aside in memory, so the file
+# always holds the terrain as of the last save (see savegame.py). Entities are few compared to
+# tiles, so they're kept in a sparse dict and never evicted.
+#
+# File format, little-endian:
+#   header - magic (4s), version (H), chunk size (H), width in tiles (I), height in tiles (I)
+#   chunks - chunk size * chunk size terrain bytes each, rows of chunks one after the other.
+#            Chunks on the right and bottom edges are padded with bedrock
+
+import mmap
+import struct
+from collections import OrderedDict
+from .grid import BLOCKING, EMPTY
+
+MAGIC = b'OCCH'
+VERSION = 1
+HEADER = struct.Struct('<4sHHII')
+# Default side of a chunk, in tiles
+CHUNK_SIZE = 64
+# Default amount of chunks kept in memory
+MAX_RESIDENT = 256
+# Chunks around the focus (i.e: the player) that are never evicted, in chunks from its own
+FOCUS_RADIUS = 1
+
+
+class ChunkFile():
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'r+b')
+        self.mm = mmap.mmap(self.file.fileno(), 0)
+        magic, version, self.chunkSize, self.width, self.height = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            raise ValueError("%s is not a chunk file"%path)
+        if version != VERSION:
+            raise ValueError("Unsupported chunk file version %d"%version)
+        self.chunksX = -(-self.width//self.chunkSize)
+        self.chunksY = -(-self.height//self.chunkSize)
+        self.chunkBytes = self.chunkSize*self.chunkSize
+
+    # Writes a new world of the given size: floor surrounded by bedrock, or tiles taken from a Tileset
+    @classmethod
+    def create(cls, path, width, height, chunkSize=CHUNK_SIZE, tileset=None):
+        chunksX = -(-width//chunkSize)
+        chunksY = -(-height//chunkSize)
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, chunkSize, width, height))
+            for cy in range(chunksY):
+                for cx in range(chunksX):
+                    f.write(cls._buildChunk(cx, cy, width, height, chunkSize, tileset))
+        return cls(path)
+
+    # Terrain of a brand new chunk
+    @staticmethod
+    def _buildChunk(cx, cy, width, height, chunkSize, tileset):
+        chunk = bytearray(chunkSize*chunkSize)
+        x0, y0 = cx*chunkSize, cy*chunkSize
+        cols = min(chunkSize, width - x0)
+        for ly in range(min(chunkSize, height - y0)):
+            y = y0 + ly
+            if tileset is not None:
+                row = tileset.terrain[y*width + x0:y*width + x0 + cols]
+            elif y == 0 or y == height-1:
+                row = bytes(cols)
+            else:
+                row = bytearray(b'\x01'*cols)
+                if x0 == 0:
+                    row[0] = 0
+                if x0 + cols == width:
+                    row[cols-1] = 0
+            chunk[ly*chunkSize:ly*chunkSize + cols] = row
+        return chunk
+
+    def offset(self, cx, cy):
+        return HEADER.size + (cy*self.chunksX + cx)*self.chunkBytes
+
+    def read(self, cx, cy):
+        start = self.offset(cx, cy)
+        return bytearray(self.mm[start:start + self.chunkBytes])
+
+    def write(self, cx, cy, terrain):
+        start = self.offset(cx, cy)
+        self.mm[start:start + self.chunkBytes] = terrain
+
+    def flush(self):
+        self.mm.flush()
+
+    def close(self):
+        self.mm.close()
+        self.file.close()
+
+# A chunk copied into memory
+class Chunk():
+
+    __slots__ = ('terrain', 'occupancy', 'dirty')
+
+    def __init__(self, terrain, occupancy):
+        self.terrain = terrain
+        self.occupancy = occupancy
+        # The terrain changed since it was read from the file
+        self.dirty = False
+
+# Same interface as TileGrid, on top of a ChunkFile
+class ChunkedGrid():
+
+    def __init__(self, chunkFile, maxResident=MAX_RESIDENT):
+        self.file = chunkFile
+        self.width = chunkFile.width
+        self.height = chunkFile.height
+        self.chunkSize = chunkFile.chunkSize
+        self.maxResident = maxResident
+        # (chunk x, chunk y) -> Chunk, the least recently used first
+        self.resident = OrderedDict()
+        # (chunk x, chunk y) -> {local index: entity code}
+        self.entities = {}
+        # Chunk keys that stay in memory no matter what
+        self.pinned = set()
+        # (chunk x, chunk y) -> terrain of the modified chunks evicted since the last flush
+        self.modified = {}
+        self.loads = 0
+        self.evictions = 0
+
+    # Returns the chunk holding the given tile coords, reading it from the file if needed
+    def chunk(self, key):
+        chunk = self.resident.get(key)
+        if chunk is not None:
+            self.resident.move_to_end(key)
+            return chunk
+        terrain = self.modified.pop(key, None)
+        dirty = terrain is not None
+        if not dirty:
+            terrain = self.file.read(*key)
+        occupancy = bytearray(terrain.translate(BLOCKING))
+        for i in self.entities.get(key, ()):
+            occupancy[i] = 1
+        chunk = self.resident[key] = Chunk(terrain, occupancy)
+        chunk.dirty = dirty
+        self.loads += 1
+        self._evict()
+        return chunk
+
+    # Drops the least recently used chunks that aren't pinned, down to maxResident. Modified ones are
+    # kept aside until the next flush
+    def _evict(self):
+        if len(self.resident) <= self.maxResident:
+            return
+        for key in list(self.resident):
+            if len(self.resident) <= self.maxResident:
+                break
+            if key in self.pinned:
+                continue
+            chunk = self.resident.pop(key)
+            if chunk.dirty:
+                self.modified[key] = chunk.terrain
+            self.evictions += 1
+
+    # Splits coords into a chunk key and the index inside that chunk
+    def locate(self, coords):
+        size = self.chunkSize
+        x, y = coords
+        return (x//size, y//size), (y % size)*size + x % size
+
+    def inside(self, coords):
+        return 0 <= coords[0] < self.width and 0 <= coords[1] < self.height
+
+    def tileAt(self, coords):
+        key, i = self.locate(coords)
+        code = self.entities.get(key, {}).get(i, EMPTY)
+        return code or self.chunk(key).terrain[i]
+
+    def terrainAt(self, coords):
+        key, i = self.locate(coords)
+        return self.chunk(key).terrain[i]
+
+    def walkable(self, coords):
+        if not self.inside(coords):
+            return False
+        key, i = self.locate(coords)
+        return not BLOCKING[self.chunk(key).terrain[i]]
+
+    def isOccupied(self, coords):
+        if not self.inside(coords):
+            return True
+        key, i = self.locate(coords)
+        return self.chunk(key).occupancy[i] == 1
+
+    # Entity codes found in the 3x3 area centered on coords, the center included
+    def surroundings(self, coords):
+        found = []
+        for y in range(coords[1]-1, coords[1]+2):
+            for x in range(coords[0]-1, coords[0]+2):
+                key, i = self.locate((x, y))
+                code = self.entities.get(key, {}).get(i, EMPTY)
+                if code != EMPTY:
+                    found.append(code)
+        return found
+
+    def plot(self, coords, entityRep):
+        if self.isOccupied(coords):
+            return False
+        key, i = self.locate(coords)
+        self.entities.setdefault(key, {})[i] = entityRep
+        self.chunk(key).occupancy[i] = 1
+        return True
+
+    def unplot(self, coords):
+        key, i = self.locate(coords)
+        entities = self.entities.get(key)
+        if not entities or i not in entities:
+            return False
+        del entities[i]
+        if not entities:
+            del self.entities[key]
+        chunk = self.chunk(key)
+        chunk.occupancy[i] = BLOCKING[chunk.terrain[i]]
+        return True
+
+    def setTerrain(self, coords, code):
+        key, i = self.locate(coords)
+        chunk = self.chunk(key)
+        chunk.terrain[i] = code
+        chunk.dirty = True
+        if i not in self.entities.get(key, ()):
+            chunk.occupancy[i] = BLOCKING[code]
+
+    # Free cells inside the rectangle going from (x0, y0) to (x1, y1), both included
+    def freeCells(self, x0, y0, x1, y1):
+        return [(x, y) for y in range(y0, y1+1) for x in range(x0, x1+1) if not self.isOccupied((x, y))]
+
+    # Pins the chunks around the given coords, so they're never evicted while the focus stays there
+    def focus(self, coords):
+        cx, cy = coords[0]//self.chunkSize, coords[1]//self.chunkSize
+        self.pinned = set((x, y) for x in range(cx-FOCUS_RADIUS, cx+FOCUS_RADIUS+1)
+                                 for y in range(cy-FOCUS_RADIUS, cy+FOCUS_RADIUS+1)
+                                 if 0 <= x < self.file.chunksX and 0 <= y < self.file.chunksY)
+        for key in self.pinned:
+            self.chunk(key)
+
+    # Returns the terrain codes of row y from column x0 to x1, x1 excluded, only reading the chunks it crosses
+    def terrainSpan(self, y, x0, x1):
+        size = self.chunkSize
+        cy, ly = y//size, (y % size)*size
+        codes = bytearray()
+        for cx in range(x0//size, (x1-1)//size + 1):
+            start = max(x0 - cx*size, 0)
+            end = min(x1 - cx*size, size)
+            codes += self.chunk((cx, cy)).terrain[ly + start:ly + end]
+        return codes
+
+    # Returns the visible tile codes of row y, entities drawn over the terrain
+    def row(self, y):
+        size = self.chunkSize
+        cy, ly = y//size, (y % size)*size
+        codes = bytearray()
+        for cx in range(self.file.chunksX):
+            cols = min(size, self.width - cx*size)
+            codes += self.chunk((cx, cy)).terrain[ly:ly + cols]
+            for i, code in self.entities.get((cx, cy), {}).items():
+                if ly <= i < ly + cols:
+                    codes[cx*size + i - ly] = code
+        return bytes(codes)
+
+    # Terrain of every chunk modified since the last flush, by chunk key
+    def modifiedChunks(self):
+        chunks = dict(self.modified)
+        for key, chunk in self.resident.items():
+            if chunk.dirty:
+                chunks[key] = chunk.terrain
+        return chunks
+
+    # Writes every modified chunk back to the file
+    def flush(self):
+        for key, terrain in self.modifiedChunks().items():
+            self.file.write(key[0], key[1], terrain)
+        for chunk in self.resident.values():
+            chunk.dirty = False
+        self.modified = {}
+        self.file.flush()
@@ -0,0 +1,143 @@
+##########################
+###   Combat Engine    ###
+##########################
+
+# Headless version of the battle rules, no screen, no getch() and no sleeps. Used by battle() for
+# the numbers, and by designers to run balancing simulations over huge amounts of fights. Nobody
+# regenerates during a fight, live battles hold regeneration until they're over (see effects.py)
+
+import random
+from array import array
+from collections import Counter
+
+from .loot import tableOf
+
+# Resolves an attack roll the same way Character.attack does, returns the damage dealt
+def attackRoll(minAttack, maxAttack, rng=random):
+    return rng.randint(minAttack, maxAttack)
+
+# Experience the player obtains for killing the given mob, r being a random number in [0, 1)
+def expReward(exptable, mobName, level, r):
+    return exptable[mobName]*(level*0.5) + r
+
+# Item IDs dropped by the given mob, droplist being the DROPLIST or its compiled LootTables (see loot.py)
+def rollDrops(droplist, mobName, rng=random):
+    return tableOf(droplist, mobName).roll(rng)
+
+# Result of a single fight
+class FightResult():
+
+    def __init__(self, won, turns, playerHp, mobHp, xp, loot, levelup):
+        self.won = won
+        self.turns = turns
+        self.playerHp = playerHp
+        self.mobHp = mobHp
+        self.xp = xp
+        self.loot = loot
+        self.levelup = levelup
+
+# Fights playerEnt against mobEnt until either dies, without touching either of them
+def fight(playerEnt, mobEnt, exptable, droplist, rng=random):
+    php, mhp = playerEnt.hp, mobEnt.hp
+    turns = 0
+    while php > 0 and mhp > 0:
+        # The player strikes first, the mob only strikes back if it survived
+        mhp -= rng.randint(playerEnt.minAttack, playerEnt.maxAttack)
+        if mhp > 0:
+            php -= rng.randint(mobEnt.minAttack, mobEnt.maxAttack)
+        turns += 1
+    if php <= 0:
+        return FightResult(False, turns, 0, mhp, 0.0, [], False)
+    xp = expReward(exptable, mobEnt.name, playerEnt.level, rng.random())
+    loot = rollDrops(droplist, mobEnt.name, rng)
+    return FightResult(True, turns, php, max(mhp, 0), xp, loot, playerEnt.exp + xp >= playerEnt.minExp)
+
+# Distributions gathered over many fights
+class BattleStats():
+
+    def __init__(self):
+        self.fights = 0
+        self.wins = 0
+        self.levelups = 0
+        # Turns-to-kill (or to die) -> number of fights
+        self.turns = Counter()
+        # Experience of every won fight
+        self.xp = array('d')
+        # ITEM_ID -> number of drops
+        self.loot = Counter()
+
+    def winRate(self):
+        return self.wins/self.fights if self.fights else 0.0
+
+    def meanTurns(self):
+        if not self.fights:
+            return 0.0
+        return sum(t*n for t, n in self.turns.items())/self.fights
+
+    # Smallest amount of turns such that the given fraction of the fights ended within it
+    def turnsPercentile(self, fraction):
+        target = fraction*self.fights
+        seen = 0
+        for t in sorted(self.turns):
+            seen += self.turns[t]
+            if seen >= target:
+                return t
+        return 0
+
+    def meanXp(self):
+        return sum(self.xp)/len(self.xp) if self.xp else 0.0
+
+    # Average amount of each item dropped per fight
+    def lootRates(self):
+        return {item: n/self.fights for item, n in self.loot.items()}
+
+    def summary(self):
+        return {'fights': self.fights,
+                'winRate': self.winRate(),
+                'meanTurns': self.meanTurns(),
+                'p50Turns': self.turnsPercentile(0.5),
+                'p95Turns': self.turnsPercentile(0.95),
+                'meanXp': self.meanXp(),
+                'levelupRate': self.levelups/self.fights if self.fights else 0.0,
+                'lootRates': self.lootRates(),
+                }
+
+# Simulates n independent fights of playerEnt against mobEnt, all at once. The HP of the fights still
+# going are kept in two lists, and each round rolls the attacks of all of them with a single
+# rng.choices() call per side, so rounds cost a few list comprehensions instead of a Python loop
+# doing an attack roll per fight. Mobs that died still roll their strike back, it's just ignored
+def simulate(playerEnt, mobEnt, n, exptable, droplist, rng=None, stats=None):
+    if rng is None:
+        rng = random.Random()
+    if stats is None:
+        stats = BattleStats()
+    choices = rng.choices
+    pRolls = range(playerEnt.minAttack, playerEnt.maxAttack + 1)
+    mRolls = range(mobEnt.minAttack, mobEnt.maxAttack + 1)
+    php = [playerEnt.hp]*n
+    mhp = [mobEnt.hp]*n
+    won = 0
+    turn = 0
+    while php:
+        turn += 1
+        going = len(php)
+        mhp = [h - d for h, d in zip(mhp, choices(pRolls, k=going))]
+        php = [h - d if m > 0 else h for h, d, m in zip(php, choices(mRolls, k=going), mhp)]
+        wins = sum(1 for p, m in zip(php, mhp) if m <= 0 < p)
+        if wins or min(php) <= 0:
+            still = [p > 0 and m > 0 for p, m in zip(php, mhp)]
+            php = [p for p, s in zip(php, still) if s]
+            mhp = [m for m, s in zip(mhp, still) if s]
+            stats.turns[turn] += going - len(php)
+            won += wins
+    stats.fights += n
+    stats.wins += won
+    # Post-battle rewards of every won fight
+    rnd = rng.random
+    base = exptable[mobEnt.name]*(playerEnt.level*0.5)
+    xp = array('d', [base + rnd() for _ in range(won)])
+    stats.xp.extend(xp)
+    needed = playerEnt.minExp - playerEnt.exp
+    stats.levelups += sum(1 for x in xp if x >= needed)
+    stats.loot.update(tableOf(droplist, mobEnt.name).rollMany(won, rng))
+    return stats
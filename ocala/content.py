@@ -0,0 +1,86 @@
+##########################
+###      Content       ###
+##########################
+
+# Game content (mobs, items, skills and maps) lives in data/content.json instead of the source. The
+# data file is compiled once into plain tables, maps turned into terrain bytes and names resolved to
+# IDs, and the tables are cached on disk with marshal, keyed by a hash of the data file. Later starts
+# only hash the file and read the cache back, and editing the data file invalidates it on its own
+#
+# Compiled tables:
+#   player   - the player's starting stats, as in the data file
+#   mobs     - rep -> (name, hp, mp, minAttack, maxAttack, glyph), glyph being None if not given
+#   droplist - mob name -> [entry, ...], items as ITEM_IDs (see loot.py for the kinds of entries)
+#   exptable - mob name -> experience given
+#   items    - (name, usable, effect name), ITEM_ID order
+#   skills   - (name, effect name, mpCost, requiredLevel, cooldown), SKILL_ID order
+#   maps     - name -> {'width', 'height', 'terrain' (bytes), 'spawnSpots', 'spawnableMobs'}
+
+import hashlib
+import marshal
+import os
+
+from .loot import resolveEntry
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "content.json")
+# Where compiled content is cached, nothing is cached if it can't be written
+CACHE_DIR = os.environ.get("OCALA_CACHE") or os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "ocala")
+# Bumped whenever the compiled tables change shape, so older caches are ignored
+FORMAT = 3
+
+
+# Turns the data file's definitions into the tables used by the game
+def compileContent(data):
+    itemIDs = dict((item['name'], i) for i, item in enumerate(data['items']))
+    tiles = data['tiles']
+    tables = {'player': data['player'],
+              'mobs': {},
+              'droplist': {},
+              'exptable': {},
+              'items': [(item['name'], item['usable'], item['effect']) for item in data['items']],
+              'skills': [(s['name'], s['effect'], s['mpCost'], s['requiredLevel'], s.get('cooldown', 0.0)) for s in data['skills']],
+              'maps': {},
+              }
+    for mob in data['mobs']:
+        tables['mobs'][mob['rep']] = (mob['name'], mob['hp'], mob['mp'], mob['minAttack'], mob['maxAttack'], mob.get('glyph'))
+        tables['droplist'][mob['name']] = [resolveEntry(entry, itemIDs.__getitem__) for entry in mob['drops']]
+        tables['exptable'][mob['name']] = mob['exp']
+    for m in data['maps']:
+        rows = m['rows']
+        width = len(rows[0])
+        if any(len(row) != width for row in rows):
+            raise ValueError("Rows of map %s aren't all the same width"%m['name'])
+        tables['maps'][m['name']] = {'width': width,
+                                     'height': len(rows),
+                                     'terrain': bytes(tiles[c] for row in rows for c in row),
+                                     'spawnSpots': m['spawnSpots'],
+                                     'spawnableMobs': m['spawnableMobs'],
+                                     }
+    return tables
+
+# Returns the compiled tables of the data file at path, out of the cache when it's up to date
+def load(path=None, cacheDir=None):
+    path = path or DATA_PATH
+    cacheDir = cacheDir or CACHE_DIR
+    with open(path, 'rb') as f:
+        raw = f.read()
+    digest = hashlib.sha1(raw).hexdigest()
+    cache = os.path.join(cacheDir, "content-%d-%s.marshal"%(FORMAT, digest))
+    try:
+        with open(cache, 'rb') as f:
+            return marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+    # Only imported on a cache miss, like the parsing itself
+    import json
+    tables = compileContent(json.loads(raw.decode('utf-8')))
+    # Written under a temporary name and renamed, so a cache is never read half-written
+    try:
+        os.makedirs(cacheDir, exist_ok=True)
+        temp = "%s.%d.tmp"%(cache, os.getpid())
+        with open(temp, 'wb') as f:
+            marshal.dump(tables, f)
+        os.replace(temp, cache)
+    except OSError:
+        pass
+    return tables
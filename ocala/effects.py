@@ -0,0 +1,168 @@
+##########################
+###   Timed Effects    ###
+##########################
+
+# Everything that happens later or over time to an entity: skill cooldowns, damage and heals over time,
+# timed buffs and the passive regeneration of HP and MP. Each session has a scheduler of its own, ticked
+# with the session's clock, holding what's due in a min-heap ordered by time, so a tick only looks at the
+# effects whose time came, however many entities have some pending. Regeneration only covers entities
+# below their max HP or MP, until they're full again, and is a single pending effect restoring all of
+# them at once through the entity store (see entities.py). Entities in a battle don't
+# regenerate until it's over, the same as in the fights combat.py simulates.
+#
+# Pending effects keep the entity and the ID it had when they were scheduled, and are dropped if it died
+# or was reused for another mob by then (see Game.MobRegistry)
+
+import heapq
+from collections import Counter
+
+from .entities import STORE
+
+# Seconds between two regeneration steps, and the share of max HP and MP regenerated by each
+REGEN_INTERVAL = 1.0
+REGEN_RATE = 0.02
+
+
+class EffectScheduler():
+
+    def __init__(self):
+        # Time of the last update, in the session's clock
+        self.now = 0.0
+        # (time, sequence, function, args) of everything pending, the sequence keeps the order of
+        # effects due at the same time
+        self.heap = []
+        self.sequence = 0
+        # (entity ID, key) -> time the cooldown ends
+        self.cooldowns = {}
+        # entity ID -> entity, of the entities regenerating, and IDs of the ones held from it (i.e: in
+        # a battle)
+        self.regenerating = {}
+        self.held = set()
+        # The regeneration step is pending
+        self.regenerationDue = False
+        # entity ID -> Counter of the stats its active buffs add
+        self.buffs = {}
+
+    def __len__(self):
+        return len(self.heap)
+
+    # Calls function(time, *args) at the given time
+    def at(self, when, function, *args):
+        heapq.heappush(self.heap, (when, self.sequence, function, args))
+        self.sequence += 1
+
+    # Runs everything due by now, effects scheduled for now or earlier while running included
+    def update(self, now):
+        self.now = now
+        heap = self.heap
+        while heap and heap[0][0] <= now:
+            when, sequence, function, args = heapq.heappop(heap)
+            function(when, *args)
+
+    ##########################
+    ###     Cooldowns      ###
+    ##########################
+
+    # Seconds before key (i.e: a skill) can be used again by entity, 0 if it can be now
+    def cooldown(self, entity, key):
+        end = self.cooldowns.get((entity.ID, key))
+        return 0.0 if end is None else max(0.0, end - self.now)
+
+    def startCooldown(self, entity, key, seconds):
+        if seconds <= 0:
+            return
+        entry = (entity.ID, key)
+        end = self.cooldowns[entry] = self.now + seconds
+        self.at(end, self._endCooldown, entry)
+
+    def _endCooldown(self, when, entry):
+        # A newer cooldown of the same key ends later, it's left alone
+        if self.cooldowns.get(entry, when) <= when:
+            self.cooldowns.pop(entry, None)
+
+    ##########################
+    ###     Over time      ###
+    ##########################
+
+    # Changes entity's HP by amount every interval seconds, count times: heals if amount is positive,
+    # damages if it's negative
+    def overTime(self, entity, amount, interval, count):
+        if count > 0:
+            self.at(self.now + interval, self._overTime, entity, entity.ID, amount, interval, count)
+
+    def _overTime(self, when, entity, ID, amount, interval, count):
+        if entity.ID != ID or entity.dead:
+            return
+        entity.hp = min(entity.MAXHP, entity.hp + amount)
+        if amount < 0:
+            entity.checkDead()
+            self.regen(entity)
+        if count > 1 and not entity.dead:
+            self.at(when + interval, self._overTime, entity, ID, amount, interval, count - 1)
+
+    ##########################
+    ###       Buffs        ###
+    ##########################
+
+    # Adds amount to entity's stat (i.e: minAttack) for duration seconds
+    def buff(self, entity, stat, amount, duration):
+        setattr(entity, stat, getattr(entity, stat) + amount)
+        self.buffs.setdefault(entity.ID, Counter())[stat] += amount
+        self.at(self.now + duration, self._unbuff, entity, entity.ID, stat, amount)
+
+    def _unbuff(self, when, entity, ID, stat, amount):
+        active = self.buffs.get(ID)
+        if active is not None:
+            active[stat] -= amount
+            if not any(active.values()):
+                del self.buffs[ID]
+        if entity.ID != ID:
+            return
+        setattr(entity, stat, getattr(entity, stat) - amount)
+        # Max HP or MP going back down takes what's over it along
+        entity.hp = min(entity.hp, entity.MAXHP)
+        entity.mp = min(entity.mp, entity.MAXMP)
+
+    # Adds the active buffs of entity back onto its stats, after something set them anew (i.e: a level up)
+    def reapply(self, entity):
+        for stat, amount in self.buffs.get(entity.ID, {}).items():
+            if amount:
+                setattr(entity, stat, getattr(entity, stat) + amount)
+
+    ##########################
+    ###    Regeneration    ###
+    ##########################
+
+    # Starts regenerating entity's HP and MP if they aren't full, nothing if it already is
+    def regen(self, entity):
+        if entity.ID in self.regenerating or entity.ID in self.held or entity.dead:
+            return
+        if entity.hp >= entity.MAXHP and entity.mp >= entity.MAXMP:
+            return
+        self.regenerating[entity.ID] = entity
+        if not self.regenerationDue:
+            self.regenerationDue = True
+            self.at(self.now + REGEN_INTERVAL, self._regen)
+
+    # A regeneration step of every entity regenerating, the ones that died, were reused for another
+    # mob or got held are dropped
+    def _regen(self, when):
+        held = self.held
+        entities = {}
+        for ID, entity in self.regenerating.items():
+            if entity.ID == ID and not entity.dead and ID not in held:
+                entities[entity.slot] = entity
+        below = STORE.regen(list(entities), REGEN_RATE)
+        self.regenerating = dict((entities[slot].ID, entities[slot]) for slot in below)
+        self.regenerationDue = bool(self.regenerating)
+        if self.regenerationDue:
+            self.at(when + REGEN_INTERVAL, self._regen)
+
+    # Keeps entity from regenerating until it's released
+    def hold(self, entity):
+        self.held.add(entity.ID)
+
+    # Lets entity regenerate again, starting right away if it isn't full
+    def release(self, entity):
+        self.held.discard(entity.ID)
+        self.regen(entity)
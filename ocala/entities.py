@@ -0,0 +1,135 @@
+##########################
+###   Entity Storage   ###
+##########################
+
+# Compact storage for characters. The numbers of every entity (hp, mp, attack range, coords, rep,
+# dead flag) live in one array per field, and each entity object only holds its slot in those
+# arrays, so entities don't carry a dict each and mass operations (regeneration, death sweeps) run
+# over the arrays in one go. Entity objects are thin proxies, their fields are properties
+# reading and writing the arrays
+
+from array import array
+
+# Fields kept in the store, and the typecode of their arrays
+COLUMNS = (('ID', 'q'),
+           ('hp', 'l'),
+           ('mp', 'l'),
+           ('MAXHP', 'l'),
+           ('MAXMP', 'l'),
+           ('minAttack', 'l'),
+           ('maxAttack', 'l'),
+           ('x', 'l'),
+           ('y', 'l'),
+           ('rep', 'H'),
+           ('dead', 'b'),
+           )
+# ID of the slots not used by any entity
+FREE = -1
+
+
+class EntityStore():
+
+    def __init__(self):
+        for name, typecode in COLUMNS:
+            setattr(self, name, array(typecode))
+        # Released slots, reused before the arrays grow
+        self.free = []
+        self.live = 0
+
+    def __len__(self):
+        return self.live
+
+    # Returns a slot for a new entity, every field set to 0
+    def allocate(self, ID):
+        if self.free:
+            slot = self.free.pop()
+            for name, typecode in COLUMNS:
+                getattr(self, name)[slot] = 0
+        else:
+            slot = len(self.ID)
+            for name, typecode in COLUMNS:
+                getattr(self, name).append(0)
+        self.ID[slot] = ID
+        self.live += 1
+        return slot
+
+    # Gives the slot back, it's flagged as dead so mass operations skip it
+    def release(self, slot):
+        self.ID[slot] = FREE
+        self.dead[slot] = 1
+        self.free.append(slot)
+        self.live -= 1
+
+    # Restores rate of the max hp and mp (at least 1 of each) of the living entities in the given slots,
+    # without going over their maximum. Returns the slots still below either maximum
+    def regen(self, slots, rate):
+        hp, mp, MAXHP, MAXMP, dead = self.hp, self.mp, self.MAXHP, self.MAXMP, self.dead
+        below = []
+        for slot in slots:
+            if dead[slot]:
+                continue
+            top = MAXHP[slot]
+            hp[slot] = min(top, hp[slot] + max(1, int(top*rate)))
+            top = MAXMP[slot]
+            mp[slot] = min(top, mp[slot] + max(1, int(top*rate)))
+            if hp[slot] < MAXHP[slot] or mp[slot] < MAXMP[slot]:
+                below.append(slot)
+        return below
+
+    # Flags every living entity whose hp dropped to 0 as dead, but the ones whose ID is in keep, returns their IDs
+    def sweepDead(self, keep=()):
+        slots = [i for i, (h, d) in enumerate(zip(self.hp, self.dead)) if h <= 0 and not d and self.ID[i] not in keep]
+        for i in slots:
+            self.hp[i] = 0
+            self.dead[i] = 1
+        return [self.ID[i] for i in slots]
+
+# Store shared by every entity
+STORE = EntityStore()
+
+# Property reading and writing the given column of the store at the entity's slot
+def column(name, convert=None):
+    values = getattr(STORE, name)
+    if convert is None:
+        def get(self):
+            return values[self.slot]
+    else:
+        def get(self):
+            return convert(values[self.slot])
+    def set(self, value):
+        values[self.slot] = value
+    return property(get, set)
+
+# Base of every character, its fields are columns of the store
+class Entity():
+
+    __slots__ = ('slot',)
+
+    def __init__(self, ID):
+        self.slot = STORE.allocate(ID)
+
+    # The slot goes back to the store when the entity isn't used anymore
+    def __del__(self):
+        try:
+            STORE.release(self.slot)
+        except (AttributeError, TypeError):
+            # Either the entity never got a slot, or the interpreter is shutting down
+            pass
+
+    ID = column('ID')
+    hp = column('hp')
+    mp = column('mp')
+    MAXHP = column('MAXHP')
+    MAXMP = column('MAXMP')
+    minAttack = column('minAttack')
+    maxAttack = column('maxAttack')
+    rep = column('rep')
+    dead = column('dead', bool)
+
+    @property
+    def coords(self):
+        return (STORE.x[self.slot], STORE.y[self.slot])
+
+    @coords.setter
+    def coords(self, coords):
+        STORE.x[self.slot], STORE.y[self.slot] = coords
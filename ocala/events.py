@@ -0,0 +1,120 @@
+##########################
+###       Events       ###
+##########################
+
+# What happens in the game (attacks, drops, level ups, deaths...) is emitted as small records on an
+# event bus instead of being printed on the spot. A record is the kind of event and its arguments, names
+# and numbers only so no entity is kept alive by the log, stored in a fixed-size ring buffer: emitting
+# costs a tuple and a list store, and nothing reaches any file or terminal until the bus is flushed.
+#
+# Sinks subscribe to a bus and get every record emitted since the last flush, in one batch:
+#   MessageSink - formats them into a session's message log, flushed once per frame before drawing it
+#   FileSink    - appends them to a file, one write per flush
+#   NullSink    - drops them, for headless runs
+# Records emitted faster than a sink is flushed overwrite the oldest ones, which are counted as dropped
+
+# Kinds of events
+(ATTACK, DEATH, DROP, LEVEL_UP, CAST, CAST_SELF, KILL, GAME_OVER, WINNER, ACTOR_DEAD, CANT_HEAL,
+ NOT_USABLE, BACKPACK_FULL, NOT_ENOUGH, MESSAGE, LEVEL_TOO_LOW, NO_MANA, COOLDOWN) = range(18)
+NAMES = ('attack', 'death', 'drop', 'levelup', 'cast', 'cast', 'kill', 'gameover', 'winner', 'dead',
+         'cantheal', 'notusable', 'backpackfull', 'notenough', 'message', 'leveltoolow', 'nomana',
+         'cooldown')
+# Records kept by each bus
+EVENT_BUFFER = 256
+
+# Text shown for each kind of event, formatted with its arguments. Kinds missing aren't shown
+FORMATS = {ATTACK: "%s attacks %s! %s loses %d health points!",
+           CAST: "%s casted %s on %s!",
+           CAST_SELF: "%s casted %s on himself!",
+           KILL: "You killed %s! You obtain %.2f experience points!",
+           GAME_OVER: "Game over!",
+           WINNER: "%s is already dead, %s is the winner!",
+           ACTOR_DEAD: "%s is dead!",
+           CANT_HEAL: "%s is dead, cannot restore health",
+           LEVEL_UP: "%s is now level %d!",
+           NOT_USABLE: "%s is not usable!",
+           BACKPACK_FULL: "Your backpack is full!",
+           NOT_ENOUGH: "You don't have enough of that item",
+           MESSAGE: "%s",
+           LEVEL_TOO_LOW: "%s must be level %d to cast %s!",
+           NO_MANA: "%s doesn't have enough MP to cast %s!",
+           COOLDOWN: "%s can't cast %s again for %.1f seconds!",
+           }
+
+# Text of a record, None for the ones that aren't shown
+def describe(kind, args):
+    if kind == DROP:
+        mob, item, count = args
+        return "%s dropped %s"%(mob, item) if count == 1 else "%s dropped %d %s"%(mob, count, item)
+    if kind == ATTACK:
+        attacker, target, dmg = args
+        return FORMATS[ATTACK]%(attacker, target, target, dmg)
+    text = FORMATS.get(kind)
+    return None if text is None else text%args
+
+
+class EventBus():
+
+    def __init__(self, size=EVENT_BUFFER):
+        self.size = size
+        self.records = [None]*size
+        # Records ever emitted, the next one goes at count % size
+        self.count = 0
+        # [sink, count at its last flush] of every subscriber
+        self.sinks = []
+        self.dropped = 0
+
+    def emit(self, kind, *args):
+        self.records[self.count % self.size] = (kind, args)
+        self.count += 1
+
+    def subscribe(self, sink):
+        self.sinks.append([sink, self.count])
+        return sink
+
+    def unsubscribe(self, sink):
+        self.sinks = [entry for entry in self.sinks if entry[0] is not sink]
+
+    # Hands every sink the records emitted since its last flush
+    def flush(self):
+        count, size, records = self.count, self.size, self.records
+        for entry in self.sinks:
+            start = entry[1]
+            if start == count:
+                continue
+            if count - start > size:
+                self.dropped += count - start - size
+                start = count - size
+            entry[0].handle([records[i % size] for i in range(start, count)])
+            entry[1] = count
+
+
+# Writes the records' text to a MessageLog (see render.py)
+class MessageSink():
+
+    def __init__(self, log):
+        self.log = log
+
+    def handle(self, batch):
+        lines = [describe(kind, args) for kind, args in batch]
+        self.log.write(''.join(line + '\n' for line in lines if line is not None))
+
+
+# Appends the records to a file, a line each: the kind of event then its arguments, tab separated
+class FileSink():
+
+    def __init__(self, path):
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def handle(self, batch):
+        self.file.write(''.join('\t'.join([NAMES[kind]] + [str(a) for a in args]) + '\n' for kind, args in batch))
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class NullSink():
+
+    def handle(self, batch):
+        pass
@@ -0,0 +1,98 @@
+##########################
+###   Field of View    ###
+##########################
+
+# What can be seen from a cell, computed by recursive shadowcasting: each of the eight octants around
+# the origin is scanned row by row moving away from it, and every wall met narrows the range of slopes
+# still lit for the rows behind it, so cells in a wall's shadow are never even looked at. Walls are seen
+# but block the view, entities don't.
+#
+# Results are cached per origin and radius, and only dropped when a tile within their radius changes,
+# so standing still or walking back and forth costs dictionary lookups
+
+from collections import OrderedDict
+
+# Sight radius, in tiles
+SIGHT = 10
+# Fields of view kept cached
+FOV_CACHE = 64
+# Multipliers turning the coordinates of the first octant into each of the eight
+OCTANTS = ((1, 0, 0, 1), (0, 1, 1, 0), (0, -1, 1, 0), (-1, 0, 0, 1),
+           (-1, 0, 0, -1), (0, -1, -1, 0), (0, 1, -1, 0), (1, 0, 0, -1))
+
+# Returns the set of cells visible from origin within radius, transparent(coords) telling which cells
+# don't block the view
+def shadowcast(transparent, origin, radius):
+    visible = {origin}
+    for xx, xy, yx, yy in OCTANTS:
+        castLight(transparent, origin, radius, 1, 1.0, 0.0, xx, xy, yx, yy, visible)
+    return visible
+
+# Lights the cells of an octant from row onwards, between the start and end slopes
+def castLight(transparent, origin, radius, row, start, end, xx, xy, yx, yy, visible):
+    if start < end:
+        return
+    ox, oy = origin
+    radius2 = radius*radius
+    newStart = start
+    for j in range(row, radius+1):
+        dx, dy = -j-1, -j
+        blocked = False
+        while dx <= 0:
+            dx += 1
+            coords = (ox + dx*xx + dy*xy, oy + dx*yx + dy*yy)
+            # Slopes of the left and right edges of the cell
+            leftSlope = (dx-0.5)/(dy+0.5)
+            rightSlope = (dx+0.5)/(dy-0.5)
+            if start < rightSlope:
+                continue
+            if end > leftSlope:
+                break
+            if dx*dx + dy*dy <= radius2:
+                visible.add(coords)
+            if blocked:
+                if not transparent(coords):
+                    # Still in the wall, its shadow grows
+                    newStart = rightSlope
+                    continue
+                blocked = False
+                start = newStart
+            elif not transparent(coords) and j < radius:
+                # A wall starts, the cells lit before it are scanned further on their own
+                blocked = True
+                castLight(transparent, origin, radius, j+1, start, leftSlope, xx, xy, yx, yy, visible)
+                newStart = rightSlope
+        if blocked:
+            break
+
+
+class FieldOfView():
+
+    def __init__(self, grid, size=FOV_CACHE):
+        self.grid = grid
+        self.size = size
+        # (origin, radius) -> frozenset of the visible cells, the most recently used last
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    # Cells visible from coords within radius
+    def visible(self, coords, radius=SIGHT):
+        key = (coords, radius)
+        cells = self.cache.get(key)
+        if cells is not None:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return cells
+        self.misses += 1
+        cells = self.cache[key] = frozenset(shadowcast(self.grid.walkable, coords, radius))
+        if len(self.cache) > self.size:
+            self.cache.popitem(last=False)
+        return cells
+
+    # The tile at coords changed, the fields of view that could reach it are dropped
+    def tileChanged(self, coords):
+        x, y = coords
+        stale = [key for key in self.cache if max(abs(key[0][0] - x), abs(key[0][1] - y)) <= key[1]]
+        for key in stale:
+            del self.cache[key]
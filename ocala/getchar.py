@@ -0,0 +1,222 @@
+class _Getch:
+    """Gets a single character from standard input.  Does not echo to the
+screen."""
+    def __init__(self):
+        try:
+            self.impl = _GetchWindows()
+        except ImportError:
+            self.impl = _GetchUnix()
+
+    def __call__(self): return self.impl()
+
+
+class _GetchUnix:
+    """Blocking reads on top of a RawInput that stays open until the program
+exits, instead of switching the terminal to raw mode and back for every key."""
+    def __init__(self):
+        import tty, sys
+        self.input = None
+
+    def __call__(self):
+        if self.input is None:
+            self.input = RawInput()
+            self.input.open()
+        keys = []
+        while not keys:
+            keys = self.input.poll(None)
+        # Keys read along with this one wait for the next call
+        self.input.pending[:0] = keys[1:]
+        return keys[0]
+
+
+class _GetchWindows:
+    def __init__(self):
+        import msvcrt
+
+    def __call__(self):
+        import msvcrt
+        return msvcrt.getch()
+
+
+getch = _Getch()
+
+
+# Names of the keys sending escape sequences, by the sequence minus its ESC
+SEQUENCES = {'[A': 'UP', '[B': 'DOWN', '[C': 'RIGHT', '[D': 'LEFT',
+             'OA': 'UP', 'OB': 'DOWN', 'OC': 'RIGHT', 'OD': 'LEFT',
+             '[H': 'HOME', '[F': 'END', 'OH': 'HOME', 'OF': 'END',
+             '[1~': 'HOME', '[2~': 'INSERT', '[3~': 'DELETE', '[4~': 'END',
+             '[5~': 'PAGEUP', '[6~': 'PAGEDOWN', '[7~': 'HOME', '[8~': 'END',
+             }
+# Same for the two-character codes of msvcrt.getwch(), by the second one
+WINDOWS_KEYS = {'H': 'UP', 'P': 'DOWN', 'M': 'RIGHT', 'K': 'LEFT',
+                'G': 'HOME', 'O': 'END', 'R': 'INSERT', 'S': 'DELETE',
+                'I': 'PAGEUP', 'Q': 'PAGEDOWN',
+                }
+ESCAPE = '\x1b'
+# Ctrl-C, raw mode delivers it as a key instead of a signal
+INTERRUPT = '\x03'
+# The same key coming in more than this many times in a row within a poll is kept for the next ones
+MAX_REPEAT = 1
+# Keys waiting to be returned, the oldest are dropped past it
+MAX_PENDING = 64
+
+
+def parseKeys(text):
+    """Splits text into keys, escape sequences becoming their names (i.e:
+'UP'). Returns the keys and the start of a sequence cut in half, if any."""
+    keys = []
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if char != ESCAPE:
+            keys.append(char)
+            i += 1
+            continue
+        if i+1 >= len(text):
+            return keys, text[i:]
+        if text[i+1] not in '[O':
+            keys.append(ESCAPE)
+            i += 1
+            continue
+        # A sequence ends with its first letter or ~
+        end = i + 2
+        while end < len(text) and not (text[end].isalpha() or text[end] == '~'):
+            end += 1
+        if end >= len(text):
+            return keys, text[i:]
+        keys.append(SEQUENCES.get(text[i+1:end+1], text[i:end+1]))
+        i = end + 1
+    return keys, ''
+
+
+def coalesce(keys, limit=MAX_REPEAT):
+    """Splits keys in the ones to handle now and the ones to keep for later:
+runs of the same key (i.e: a key held down, arriving in bursts over a slow
+link) go through limit at a time. No key is dropped here, RawInput.poll()
+is the one capping the keys kept for later to MAX_PENDING."""
+    now, later = [], []
+    run = 0
+    for i, key in enumerate(keys):
+        run = run + 1 if i and key == keys[i-1] else 1
+        if run > limit or later:
+            later.append(key)
+        else:
+            now.append(key)
+    return now, later
+
+
+class RawInput:
+    """Non-blocking keyboard input. The terminal is put in raw mode once, and
+restored when closed, at exit, or when the process is killed. Keys are read
+in batches with select and os.read, escape sequences are turned into key
+names, and repeated keys are spread over several polls."""
+    def __init__(self, fd=None):
+        try:
+            import msvcrt
+            self.msvcrt = msvcrt
+        except ImportError:
+            self.msvcrt = None
+        self.fd = fd
+        self.old_settings = None
+        self.decoder = None
+        # Start of an escape sequence cut between two reads
+        self.partial = ''
+        # Keys read but not returned yet
+        self.pending = []
+        self.old_handlers = {}
+
+    def open(self):
+        if self.msvcrt is not None or self.old_settings is not None:
+            return self
+        import atexit, codecs, signal, sys, termios, tty
+        if self.fd is None:
+            self.fd = sys.stdin.fileno()
+        self.decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        self.old_settings = termios.tcgetattr(self.fd)
+        tty.setraw(self.fd)
+        atexit.register(self.close)
+        # Killed processes don't run atexit, the terminal is restored before dying
+        for signum in (signal.SIGTERM, signal.SIGHUP):
+            try:
+                self.old_handlers[signum] = signal.signal(signum, self._killed)
+            except (ValueError, OSError):
+                pass
+        return self
+
+    def close(self):
+        if self.old_settings is not None:
+            import signal, termios
+            termios.tcsetattr(self.fd, termios.TCSADRAIN, self.old_settings)
+            self.old_settings = None
+            for signum, handler in self.old_handlers.items():
+                signal.signal(signum, handler)
+            self.old_handlers = {}
+
+    def _killed(self, signum, frame):
+        import os, signal
+        self.close()
+        signal.signal(signum, signal.SIG_DFL)
+        os.kill(os.getpid(), signum)
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def read(self, timeout):
+        """Waits at most timeout seconds (forever if None) for input, returns
+the keys read."""
+        if self.msvcrt is not None:
+            return self._readWindows(timeout)
+        import os, select
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            # Nothing followed a lone ESC, it was the escape key
+            keys = [ESCAPE] if self.partial == ESCAPE else []
+            self.partial = ''
+            return keys
+        data = os.read(self.fd, 1024)
+        if not data:
+            return []
+        keys, self.partial = parseKeys(self.partial + self.decoder.decode(data))
+        return keys
+
+    def _readWindows(self, timeout):
+        import time
+        msvcrt = self.msvcrt
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not msvcrt.kbhit() and (deadline is None or time.monotonic() < deadline):
+            time.sleep(0.005)
+        keys = []
+        while msvcrt.kbhit():
+            key = msvcrt.getwch()
+            if key in ('\x00', '\xe0'):
+                code = msvcrt.getwch()
+                key = WINDOWS_KEYS.get(code, key + code)
+            keys.append(key)
+        return keys
+
+    def poll(self, timeout):
+        """Returns the keys to handle now, waiting at most timeout seconds if
+there are none pending. At most MAX_PENDING keys are kept for later, past
+that the oldest ones are dropped, so a backlog never grows without bound.
+Raises KeyboardInterrupt on Ctrl-C."""
+        if not self.pending:
+            keys = self.read(timeout)
+        elif self.msvcrt is None:
+            keys = self.read(0)
+        else:
+            keys = self._readWindows(0)
+        if INTERRUPT in keys:
+            raise KeyboardInterrupt
+        now, self.pending = coalesce(self.pending + keys)
+        if len(self.pending) > MAX_PENDING:
+            del self.pending[:-MAX_PENDING]
+        return now
+
+
+# The game loop's input, kept under its older name
+NonBlockingInput = RawInput
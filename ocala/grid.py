@@ -0,0 +1,165 @@
+##########################
+###     Tile Grid      ###
+##########################
+
+# Storage engine behind the Map class. A map is held in three flat, row-major layers:
+#   terrain   - what the map is made of (0 = bedrock, 1 = floor), shared copy-on-write between maps
+#   entities  - numerical representation of whatever stands on each cell (0 = nothing)
+#   occupancy - 1 where a cell is blocked (by terrain or by an entity), 0 where it's free
+# Every code has to fit in a byte, which covers all the tile codes used by the game
+
+# Terrain codes entities can stand on, anything else blocks movement
+WALKABLE = (1,)
+# Value of the entity layer where nothing stands
+EMPTY = 0
+
+# Translation table turning terrain bytes into occupancy bytes
+BLOCKING = bytes(0 if code in WALKABLE else 1 for code in range(256))
+
+# Immutable terrain of a tileset, compiled once and shared between every map built from it
+class Tileset():
+
+    def __init__(self, width, height, terrain):
+        self.width = width
+        self.height = height
+        self.terrain = bytes(terrain)
+        self.occupancy = self.terrain.translate(BLOCKING)
+
+    # Builds a tileset out of a list of lists of tile codes (i.e: MAIN)
+    @classmethod
+    def fromRows(cls, rows):
+        width = len(rows[0])
+        terrain = bytearray()
+        for row in rows:
+            if len(row) != width:
+                raise ValueError("Every row of a tileset must have the same width")
+            terrain.extend(row)
+        return cls(width, len(rows), terrain)
+
+# Compiled tilesets, keyed by the id of the list of lists they came from. The original rows are
+# kept alongside so the id can't be recycled, tilesets are treated as read-only once compiled
+_COMPILED = {}
+
+# Returns the shared Tileset for the given rows, compiling it only the first time it's seen
+def compileTileset(rows):
+    if isinstance(rows, Tileset):
+        return rows
+    cached = _COMPILED.get(id(rows))
+    if cached is None or cached[0] is not rows:
+        cached = _COMPILED[id(rows)] = (rows, Tileset.fromRows(rows))
+    return cached[1]
+
+
+class TileGrid():
+
+    def __init__(self, tileset):
+        self.tileset = tileset
+        self.width = tileset.width
+        self.height = tileset.height
+        # Shared with the tileset until the first terrain write
+        self.terrain = tileset.terrain
+        self.ownsTerrain = False
+        self.entities = bytearray(self.width*self.height)
+        self.occupancy = bytearray(tileset.occupancy)
+        # Rows whose terrain changed, until whoever saves the grid clears them
+        self.changedRows = set()
+
+    # Flat index of the given coords (tuple)
+    def index(self, coords):
+        return coords[1]*self.width + coords[0]
+
+    # Returns what's visible at the given coords, the entity if there's one, the terrain otherwise
+    def tileAt(self, coords):
+        i = coords[1]*self.width + coords[0]
+        return self.entities[i] or self.terrain[i]
+
+    # Returns the terrain code at the given coords, ignoring entities
+    def terrainAt(self, coords):
+        return self.terrain[coords[1]*self.width + coords[0]]
+
+    # Checks if the terrain at the given coords can be walked on, cells outside the grid can't
+    def walkable(self, coords):
+        x, y = coords
+        if x < 0 or y < 0 or x >= self.width or y >= self.height:
+            return False
+        return not BLOCKING[self.terrain[y*self.width + x]]
+
+    # Checks if the given coords are blocked, either by the terrain or by an entity
+    def isOccupied(self, coords):
+        return self.occupancy[coords[1]*self.width + coords[0]] == 1
+
+    # Entity codes found in the 3x3 area centered on coords, the center included
+    def surroundings(self, coords):
+        found = []
+        start = (coords[1]-1)*self.width + coords[0] - 1
+        for row in range(3):
+            i = start + row*self.width
+            for code in self.entities[i:i+3]:
+                if code != EMPTY:
+                    found.append(code)
+        return found
+
+    # Writes entityRep at the given coords if the cell is free, returns whether it was written
+    def plot(self, coords, entityRep):
+        i = coords[1]*self.width + coords[0]
+        if self.occupancy[i]:
+            return False
+        self.entities[i] = entityRep
+        self.occupancy[i] = 1
+        return True
+
+    # Removes the entity at the given coords, leaving the terrain underneath untouched
+    def unplot(self, coords):
+        i = coords[1]*self.width + coords[0]
+        if self.entities[i] == EMPTY:
+            return False
+        self.entities[i] = EMPTY
+        self.occupancy[i] = BLOCKING[self.terrain[i]]
+        return True
+
+    # Changes the terrain at the given coords, copying the shared terrain on the first write
+    def setTerrain(self, coords, code):
+        if not self.ownsTerrain:
+            self.terrain = bytearray(self.terrain)
+            self.ownsTerrain = True
+        i = coords[1]*self.width + coords[0]
+        self.terrain[i] = code
+        self.changedRows.add(coords[1])
+        if self.entities[i] == EMPTY:
+            self.occupancy[i] = BLOCKING[code]
+
+    # Free cells inside the rectangle going from (x0, y0) to (x1, y1), both included
+    def freeCells(self, x0, y0, x1, y1):
+        occupancy = self.occupancy
+        cells = []
+        for y in range(y0, y1+1):
+            start = y*self.width
+            end = start + x1 + 1
+            i = occupancy.find(0, start + x0, end)
+            while i != -1:
+                cells.append((i - start, y))
+                i = occupancy.find(0, i + 1, end)
+        return cells
+
+    # Lets the grid know where the action is, nothing to do when the whole map is in memory
+    def focus(self, coords):
+        pass
+
+    # Returns the terrain codes of row y from column x0 to x1, x1 excluded
+    def terrainSpan(self, y, x0, x1):
+        start = y*self.width
+        return bytearray(self.terrain[start + x0:start + x1])
+
+    # Returns the visible tile codes of row y, entities drawn over the terrain
+    def row(self, y):
+        start = y*self.width
+        end = start + self.width
+        entities = self.entities[start:end]
+        # Rows without entities are just the terrain
+        if entities.count(EMPTY) == self.width:
+            return bytes(self.terrain[start:end])
+        codes = bytearray(self.terrain[start:end])
+        for x, code in enumerate(entities):
+            if code != EMPTY:
+                codes[x] = code
+        return bytes(codes)
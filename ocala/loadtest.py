@@ -0,0 +1,303 @@
+##########################
+###     Load Test      ###
+##########################
+
+# Drives the game with scripted bot players instead of people at a keyboard, to see how a server holds
+# up with many players and mobs. The bots are spread over a number of maps, each map hosted by a session
+# of its own (see Game.Session) and filled with mobs by Map.setSpawn, and the game is ticked back to back
+# for a fixed duration, as fast as it goes, drawing frames at the usual frame rate into a throwaway
+# output. Kinds of bots, handed out in turns:
+#   walk  - walks around at random
+#   chase - walks towards the nearest mob
+#   grind - chases the nearest mob and fights it with battle() once next to it
+#
+#   python -m ocala.loadtest --bots 10,100,500 --maps 4 --density 2 --duration 10
+#
+# Reported for every run: sustained ticks per second (and how many times the tick rate that is), tick
+# latency percentiles, peak RSS, and memory blocks allocated and garbage collections per tick. CPython
+# doesn't count allocations as they happen, the blocks are the ones still allocated at the end of the
+# run over the ones at its start, so they show what every tick leaves behind
+
+import argparse
+import gc
+import io
+import json
+import random
+import sys
+import time
+from contextlib import redirect_stdout
+
+from . import Game
+from .bench import tileset
+from .pathfinding import findPath
+from .profiling import RingBuffer
+
+# Map size, in tiles
+MAP_WIDTH = 80
+MAP_HEIGHT = 40
+# Mobs spawned per 100 tiles of map
+DENSITY = 2.0
+# Actions per second of each bot, about what a player holding a key down does
+BOT_ACTIONS = 5
+# Tiles a bot looks around for mobs, and nodes its path searches give up at
+BOT_SIGHT = 12
+BOT_SEARCH = 200
+# Tick latencies kept for the percentiles
+LATENCY_HISTORY = 1 << 16
+MOVES = ((0, -1), (0, 1), (-1, 0), (1, 0))
+
+
+# Screen of a bot, counts what would've been sent and drops it
+class NullOutput():
+
+    def __init__(self):
+        self.written = 0
+
+    def write(self, text):
+        self.written += len(text)
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+# Bot walking around at random
+class WalkBot():
+
+    kind = "walk"
+
+    def __init__(self, player, session, rng):
+        self.player = player
+        self.session = session
+        self.rng = rng
+
+    def act(self, now):
+        player = self.player
+        if player.dead:
+            # Dead bots are back on their feet straight away, the load has to stay the same
+            player.revive()
+            player.hp = player.MAXHP
+        fight = self.session.battle
+        if fight is not None and fight.playerEnt is player:
+            # A mob found it, the fight goes on until either dies
+            fight.handleKey("a", now)
+            return
+        self.step()
+
+    def step(self):
+        dx, dy = self.rng.choice(MOVES)
+        self.player.move(dx, dy)
+
+
+# Bot walking towards the nearest mob, following a path to it
+class ChaseBot(WalkBot):
+
+    kind = "chase"
+
+    def __init__(self, player, session, rng):
+        WalkBot.__init__(self, player, session, rng)
+        self.target = None
+        self.path = []
+
+    # Nearest living mob within BOT_SIGHT, None if there's none
+    def nearestMob(self):
+        player = self.player
+        x, y = player.coords
+        mobs = [mob for mob in player.map.mobsNear(player.coords, BOT_SIGHT) if not mob.dead]
+        if not mobs:
+            return None
+        return min(mobs, key=lambda mob: abs(mob.coords[0] - x) + abs(mob.coords[1] - y))
+
+    def step(self):
+        player = self.player
+        target = self.target
+        if target is None or target.dead or target.map is not player.map or not self.path or self.path[-1] != target.coords:
+            target = self.target = self.nearestMob()
+            if target is None:
+                self.path = []
+                return WalkBot.step(self)
+            self.path = findPath(player.map.grid, player.coords, target.coords, BOT_SEARCH) or []
+        if len(self.path) > 1:
+            nx, ny = self.path.pop(0)
+            if not player.move(nx - player.coords[0], ny - player.coords[1]):
+                # Something's in the way, the path is searched again next time
+                self.path = []
+        elif not self.path:
+            WalkBot.step(self)
+        else:
+            self.reached(target)
+
+    # Next to its target
+    def reached(self, target):
+        self.path = []
+
+
+# Bot fighting every mob it chases down
+class GrindBot(ChaseBot):
+
+    kind = "grind"
+
+    def reached(self, target):
+        self.path = []
+        if self.session.battle is None:
+            Game.battle(self.player, target, getKey=lambda: "a", wait=lambda seconds: None)
+
+BOTS = {'walk': WalkBot, 'chase': ChaseBot, 'grind': GrindBot}
+
+
+# Bots playing on their maps, ticked and measured as one server
+class LoadTest():
+
+    def __init__(self, bots, maps=1, density=DENSITY, kinds=('walk', 'chase', 'grind'), width=MAP_WIDTH, height=MAP_HEIGHT, seed=1234):
+        self.rng = random.Random(seed)
+        random.seed(seed)
+        stats = Game.CONTENT.PLAYER
+        spots = max(1, int(width*height*density/100))
+        spawnable = sorted(Game.CONTENT.MOBS.byRep)
+        self.sessions = []
+        self.bots = []
+        self.outputs = []
+        for i in range(maps):
+            m = Game.Map("Load%d"%i, tileset(width, height), spots, spawnable)
+            players = []
+            for j in range(i, bots, maps):
+                player = Game.Player("Bot%d"%j, stats['hp'], stats['mp'], stats['minAttack'], stats['maxAttack'], (0, 0), stats['rep'])
+                while True:
+                    player.coords = (self.rng.randrange(1, width-1), self.rng.randrange(1, height-1))
+                    if m.addEntity(player):
+                        break
+                players.append(player)
+            if not players:
+                continue
+            out = NullOutput()
+            session = Game.Session(players[0], {"Current": m, "Main": m}, entities=players, out=out)
+            m.grid.focus(players[0].coords)
+            m.setSpawn()
+            self.sessions.append(session)
+            self.outputs.append(out)
+            for player in players:
+                bot = BOTS[kinds[len(self.bots) % len(kinds)]]
+                self.bots.append(bot(player, session, self.rng))
+        self.ticks = 0
+        self.latency = RingBuffer(LATENCY_HISTORY)
+        self.collections = 0
+
+    def close(self):
+        for session in self.sessions:
+            session.close()
+
+    # Every bot acts every this many ticks, a different share of them each tick
+    def actionTicks(self):
+        return max(1, int(round(Game.TICK_RATE/float(BOT_ACTIONS))))
+
+    # A tick of the whole server: bots act, every session ticks, dead mobs are swept, frames are drawn
+    def tick(self, frameDebt):
+        every = self.actionTicks()
+        phase = self.ticks % every
+        for i in range(phase, len(self.bots), every):
+            bot = self.bots[i]
+            bot.act(bot.session.scheduler.now)
+        for session in self.sessions:
+            session.scheduler.tick()
+        self.ticks += 1
+        if self.ticks % max(1, int(Game.MOB_STEP*Game.TICK_RATE)) == 0:
+            Game.sweepDead(0.0, Game.MOB_STEP)
+        if frameDebt >= 1.0:
+            for session in self.sessions:
+                session.scheduler.render()
+            frameDebt -= 1.0
+        return frameDebt + Game.FRAME_RATE/float(Game.TICK_RATE)
+
+    def countCollection(self, phase, info):
+        if phase == "start":
+            self.collections += 1
+
+    # Ticks as fast as it can for duration seconds, returns the measurements
+    def run(self, duration, warmup=20):
+        frameDebt = 1.0
+        clock = time.perf_counter
+        with redirect_stdout(io.StringIO()):
+            for i in range(warmup):
+                frameDebt = self.tick(frameDebt)
+            self.ticks = 0
+            gc.callbacks.append(self.countCollection)
+            blocks = sys.getallocatedblocks()
+            start = clock()
+            end = start + duration
+            try:
+                now = start
+                while now < end:
+                    frameDebt = self.tick(frameDebt)
+                    last, now = now, clock()
+                    self.latency.add(now - last)
+            finally:
+                gc.callbacks.remove(self.countCollection)
+        elapsed = clock() - start
+        blocks = sys.getallocatedblocks() - blocks
+        ticks = max(1, self.ticks)
+        p50, p95, p99 = self.latency.percentiles(50, 95, 99)
+        return {'bots': len(self.bots),
+                'maps': len(self.sessions),
+                'mobs': sum(len(s.maps["Current"].mobsInMap) for s in self.sessions),
+                'ticks': self.ticks,
+                'ticksPerSecond': self.ticks/elapsed,
+                'realtime': self.ticks/elapsed/Game.TICK_RATE,
+                'p50': p50,
+                'p95': p95,
+                'p99': p99,
+                'max': max(self.latency.filled()) if self.ticks else 0.0,
+                'peakRSS': peakRSS(),
+                'blocksPerTick': blocks/float(ticks),
+                'gcPerTick': self.collections/float(ticks),
+                'bytesPerTick': sum(out.written for out in self.outputs)/float(ticks),
+                }
+
+# Highest resident set size of the process so far, in bytes, None where the resource module is missing
+def peakRSS():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux gives it in kilobytes, macOS in bytes
+    return peak if sys.platform == "darwin" else peak*1024
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load tests The Story of Ocala with scripted bots")
+    parser.add_argument('--bots', default="100", help="bots per run, several runs if comma separated (i.e: 10,100,1000)")
+    parser.add_argument('--maps', type=int, default=1)
+    parser.add_argument('--density', type=float, default=DENSITY, help="mobs per 100 tiles")
+    parser.add_argument('--kinds', default="walk,chase,grind", help="kinds of bots, handed out in turns")
+    parser.add_argument('--width', type=int, default=MAP_WIDTH)
+    parser.add_argument('--height', type=int, default=MAP_HEIGHT)
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds each run lasts")
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--output', help="writes the results to this JSON file")
+    args = parser.parse_args(argv)
+    kinds = args.kinds.split(",")
+    for kind in kinds:
+        if kind not in BOTS:
+            parser.error("unknown kind of bot %s"%kind)
+    Game.newGame()
+    results = []
+    print("%6s %5s %6s %9s %7s %9s %9s %9s %9s %10s %8s"%("bots", "maps", "mobs", "ticks/s", "x rate",
+                                                           "p50 ms", "p95 ms", "p99 ms", "max ms", "RSS MB", "blk/tick"))
+    for bots in [int(n) for n in args.bots.split(",")]:
+        test = LoadTest(bots, args.maps, args.density, kinds, args.width, args.height, args.seed)
+        try:
+            result = test.run(args.duration)
+        finally:
+            test.close()
+        results.append(result)
+        rss = result['peakRSS']
+        print("%6d %5d %6d %9.1f %7.2f %9.3f %9.3f %9.3f %9.3f %10s %8.1f"%(
+            result['bots'], result['maps'], result['mobs'], result['ticksPerSecond'], result['realtime'],
+            result['p50']*1e3, result['p95']*1e3, result['p99']*1e3, result['max']*1e3,
+            "-" if rss is None else "%.1f"%(rss/1048576.0), result['blocksPerTick']))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'meta': vars(args), 'results': results}, f, indent=2, sort_keys=True)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
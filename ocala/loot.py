@@ -0,0 +1,172 @@
+##########################
+###        Loot        ###
+##########################
+
+# What mobs drop, compiled out of the DROPLIST into one table per mob. A droplist holds two kinds of
+# entries:
+#   independent - [ITEM_ID, RATE] dropping when random() >= RATE (RATE being the chance it doesn't),
+#                 or {'item': ITEM_ID, 'chance': p, 'count': n} dropping n of the item with chance p
+#   pick-one    - {'chance': p, 'oneOf': [[weight, outcome], ...]} dropping, with chance p, exactly one
+#                 of the outcomes picked by weight. An outcome is an ITEM_ID, None for nothing, or
+#                 another pick-one group, nested as deep as wanted
+# In the data file and in registerMob() items can be given by name as well.
+#
+# Each pick-one group is flattened when compiled into the odds of every item it can end up dropping
+# (plus nothing), so rolling it never walks the nesting: a single roll is one random number looked up
+# in an alias table, and N rolls go through random.choices() over the cumulative odds. Independent
+# entries roll once each, or as a binomial draw for N kills where the random module has it
+
+import random
+from collections import Counter
+from itertools import repeat
+
+# Outcomes of an independent entry, for random.choices()
+HIT_MISS = (True, False)
+
+
+# Returns entry with its items (and the ones of its nested groups) turned into ITEM_IDs by itemID
+def resolveEntry(entry, itemID):
+    if isinstance(entry, dict):
+        entry = dict(entry)
+        if 'item' in entry:
+            entry['item'] = itemID(entry['item'])
+        if 'oneOf' in entry:
+            entry['oneOf'] = [[weight, None if outcome is None else resolveEntry(outcome, itemID)]
+                              for weight, outcome in entry['oneOf']]
+        return entry
+    if isinstance(entry, (list, tuple)):
+        return [itemID(entry[0]), entry[1]]
+    return itemID(entry)
+
+# Odds of every outcome of a pick-one group as {ITEM_ID or None: probability}, scaled by scale
+def flatten(group, scale=1.0, odds=None):
+    if odds is None:
+        odds = Counter()
+    chance = group.get('chance', 1.0)
+    choices = group['oneOf']
+    total = float(sum(weight for weight, outcome in choices))
+    if chance < 1.0:
+        odds[None] += scale*(1.0 - chance)
+    if total <= 0:
+        odds[None] += scale*chance
+        return odds
+    for weight, outcome in choices:
+        p = scale*chance*weight/total
+        if isinstance(outcome, dict):
+            flatten(outcome, p, odds)
+        else:
+            odds[outcome] += p
+    return odds
+
+# Alias table of the given probabilities (Vose's method), as (probability, alias) tuples
+def aliasTable(probabilities):
+    n = len(probabilities)
+    total = sum(probabilities)
+    scaled = [p*n/total for p in probabilities]
+    prob = [1.0]*n
+    alias = list(range(n))
+    small = [i for i, p in enumerate(scaled) if p < 1.0]
+    large = [i for i, p in enumerate(scaled) if p >= 1.0]
+    while small and large:
+        s, l = small.pop(), large.pop()
+        prob[s], alias[s] = scaled[s], l
+        scaled[l] += scaled[s] - 1.0
+        (small if scaled[l] < 1.0 else large).append(l)
+    # What's left is 1.0 give or take rounding errors
+    return tuple(prob), tuple(alias)
+
+
+# A pick-one group, flattened
+class PickOne():
+
+    __slots__ = ('outcomes', 'prob', 'alias', 'cumulative')
+
+    def __init__(self, odds):
+        self.outcomes = tuple(odds)
+        self.prob, self.alias = aliasTable([odds[o] for o in self.outcomes])
+        cumulative = []
+        total = 0.0
+        for o in self.outcomes:
+            total += odds[o]
+            cumulative.append(total)
+        self.cumulative = tuple(cumulative)
+
+    # The outcome of a roll, r being a random number in [0, 1)
+    def pick(self, r):
+        u = r*len(self.outcomes)
+        i = int(u)
+        return self.outcomes[i] if u - i < self.prob[i] else self.outcomes[self.alias[i]]
+
+    # Outcome -> times it came out over n rolls
+    def pickMany(self, n, rng=random):
+        return Counter(rng.choices(self.outcomes, cum_weights=self.cumulative, k=n))
+
+
+# Compiled drops of a mob, only read once built
+class LootTable():
+
+    __slots__ = ('independent', 'groups')
+
+    def __init__(self, independent, groups):
+        # (ITEM_ID, chance, count) of each independent entry
+        self.independent = tuple(independent)
+        self.groups = tuple(groups)
+
+    # ITEM_IDs dropped by one kill, an item dropped n times being in there n times
+    def roll(self, rng=random):
+        rnd = rng.random
+        drops = []
+        for itemID, chance, count in self.independent:
+            if rnd() < chance:
+                drops.extend(repeat(itemID, count))
+        for group in self.groups:
+            itemID = group.pick(rnd())
+            if itemID is not None:
+                drops.append(itemID)
+        return drops
+
+    # ITEM_ID -> amount dropped over n kills, rolled all at once
+    def rollMany(self, n, rng=random):
+        totals = Counter()
+        if n <= 0:
+            return totals
+        binomial = getattr(rng, 'binomialvariate', None)
+        for itemID, chance, count in self.independent:
+            if binomial is not None:
+                hits = binomial(n, chance)
+            else:
+                hits = rng.choices(HIT_MISS, cum_weights=(chance, 1.0), k=n).count(True)
+            if hits:
+                totals[itemID] += hits*count
+        for group in self.groups:
+            totals.update(group.pickMany(n, rng))
+        totals.pop(None, None)
+        return totals
+
+
+# LootTable of a mob's droplist entries, whose items are ITEM_IDs already
+def compileEntries(entries):
+    independent, groups = [], []
+    for entry in entries:
+        if isinstance(entry, dict) and 'oneOf' in entry:
+            odds = flatten(entry)
+            if any(p > 0 for outcome, p in odds.items() if outcome is not None):
+                groups.append(PickOne(odds))
+        elif isinstance(entry, dict):
+            chance = entry.get('chance', 1.0)
+            if chance > 0:
+                independent.append((entry['item'], min(chance, 1.0), entry.get('count', 1)))
+        else:
+            itemID, rate = entry
+            if rate < 1.0:
+                independent.append((itemID, 1.0 - max(rate, 0.0), 1))
+    return LootTable(independent, groups)
+
+# Mob name -> LootTable of every mob in droplist
+def compileDroplist(droplist):
+    return dict((name, compileEntries(entries)) for name, entries in droplist.items())
+
+# LootTable of the mob called name in droplist, which may hold compiled tables already
+def tableOf(droplist, name):
+    entries = droplist[name]
+    return entries if isinstance(entries, LootTable) else compileEntries(entries)
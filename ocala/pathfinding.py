@@ -0,0 +1,125 @@
+##########################
+###    Pathfinding     ###
+##########################
+
+# Flow fields and A* over the terrain of a map's grid. A flow field holds the distance, in steps, from
+# every cell around a target to that target, so any amount of mobs chasing the same target share a
+# single search and each of them only has to look at its 4 neighbours to know where to step.
+# Only the terrain is taken into account, entities come and go too often to be part of the field
+
+import heapq
+from collections import deque
+
+# Offsets of the 4 neighbours of a cell: left, right, down, up
+NEIGHBOURS = ((-1, 0), (1, 0), (0, 1), (0, -1))
+
+
+class FlowField():
+
+    def __init__(self, grid, target, maxDistance):
+        self.grid = grid
+        self.target = target
+        # Cells further than maxDistance steps are left out of the field
+        self.maxDistance = maxDistance
+        # coords -> steps to the target
+        self.distances = {}
+        self.dirty = True
+        self.build()
+
+    # Breadth-first search from the target, up to maxDistance steps
+    def build(self):
+        self.distances = {self.target: 0}
+        queue = deque([self.target])
+        self._spread(queue)
+        self.dirty = False
+
+    # Spreads the distances from the cells in the queue to their neighbours, only ever lowering them
+    def _spread(self, queue):
+        distances = self.distances
+        limit = self.maxDistance
+        walkable = self.grid.walkable
+        while queue:
+            coords = queue.popleft()
+            d = distances[coords] + 1
+            if d > limit:
+                continue
+            for dx, dy in NEIGHBOURS:
+                n = (coords[0]+dx, coords[1]+dy)
+                if distances.get(n, limit+1) > d and walkable(n):
+                    distances[n] = d
+                    queue.append(n)
+
+    # Steps from the given coords to the target, None if it's out of reach
+    def distance(self, coords):
+        if self.dirty:
+            self.build()
+        return self.distances.get(coords)
+
+    # Updates the field after the terrain at coords changed. A new walkable cell can only shorten
+    # paths, so the distances are spread from it. A new wall only matters if the field went through it
+    def tileChanged(self, coords):
+        if self.dirty:
+            return
+        if self.grid.walkable(coords):
+            best = None
+            for dx, dy in NEIGHBOURS:
+                d = self.distances.get((coords[0]+dx, coords[1]+dy))
+                if d is not None and (best is None or d < best):
+                    best = d
+            if coords == self.target:
+                best = -1
+            if best is not None and best + 1 <= self.maxDistance and self.distances.get(coords, self.maxDistance+1) > best + 1:
+                self.distances[coords] = best + 1
+                self._spread(deque([coords]))
+        elif coords in self.distances:
+            self.dirty = True
+
+    # Returns the free neighbour of coords closest to the target, None if none of them gets any closer
+    def step(self, coords, isOccupied):
+        current = self.distance(coords)
+        if current is None:
+            return None
+        best = None
+        for dx, dy in NEIGHBOURS:
+            n = (coords[0]+dx, coords[1]+dy)
+            d = self.distances.get(n)
+            if d is not None and d < current and not isOccupied(n):
+                current = d
+                best = n
+        return best
+
+# Shortest path from start to goal with A*, as a list of coords without start, None if unreachable.
+# The goal is allowed to be occupied, so the path can lead up to an entity. maxNodes caps the search
+def findPath(grid, start, goal, maxNodes=None):
+    walkable = grid.walkable
+    gx, gy = goal
+    if start == goal:
+        return []
+    came = {start: None}
+    cost = {start: 0}
+    frontier = [(abs(start[0]-gx) + abs(start[1]-gy), 0, start)]
+    expanded = 0
+    while frontier:
+        _, g, coords = heapq.heappop(frontier)
+        if coords == goal:
+            path = []
+            while coords != start:
+                path.append(coords)
+                coords = came[coords]
+            path.reverse()
+            return path
+        if g > cost[coords]:
+            continue
+        expanded += 1
+        if maxNodes is not None and expanded > maxNodes:
+            return None
+        for dx, dy in NEIGHBOURS:
+            x, y = coords[0]+dx, coords[1]+dy
+            n = (x, y)
+            if n != goal and not walkable(n):
+                continue
+            if g + 1 < cost.get(n, g + 2):
+                cost[n] = g + 1
+                came[n] = coords
+                heapq.heappush(frontier, (g + 1 + abs(x-gx) + abs(y-gy), g + 1, n))
+    return None
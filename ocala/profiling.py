@@ -0,0 +1,140 @@
+##########################
+###     Profiling      ###
+##########################
+
+# Timing spans and counters for the phases of the game loop. Every span keeps its last durations in
+# a ring buffer, so rolling percentiles (p50/p95/p99) are always at hand, and everything can be dumped
+# as JSON or in the Prometheus text format. A disabled profiler hands out a shared span that does
+# nothing, so leaving the calls in costs a method call and an empty with block
+
+import json
+import time
+from array import array
+
+# Durations kept for each span
+HISTORY = 512
+
+
+class RingBuffer():
+
+    def __init__(self, size=HISTORY):
+        self.values = array('d', bytes(8*size))
+        self.size = size
+        self.count = 0
+
+    def add(self, value):
+        self.values[self.count % self.size] = value
+        self.count += 1
+
+    # Values currently held, in no particular order
+    def filled(self):
+        return self.values[:min(self.count, self.size)]
+
+    # Returns the given percentiles (0-100) of the values held, nearest-rank
+    def percentiles(self, *wanted):
+        values = sorted(self.filled())
+        if not values:
+            return tuple(0.0 for p in wanted)
+        last = len(values) - 1
+        return tuple(values[min(last, int(round(p/100.0*last)))] for p in wanted)
+
+
+# Span of a disabled profiler
+class NullSpan():
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_SPAN = NullSpan()
+
+
+class Span():
+
+    __slots__ = ('buffer', 'start')
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.buffer.add(time.perf_counter() - self.start)
+        return False
+
+
+class Profiler():
+
+    def __init__(self, enabled=False, history=HISTORY):
+        self.enabled = enabled
+        self.history = history
+        # span name -> RingBuffer of its durations, in seconds
+        self.spans = {}
+        # counter name -> total
+        self.counters = {}
+
+    def buffer(self, name):
+        buffer = self.spans.get(name)
+        if buffer is None:
+            buffer = self.spans[name] = RingBuffer(self.history)
+        return buffer
+
+    # Times a with block under the given name
+    def span(self, name):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self.buffer(name))
+
+    # Records a duration measured somewhere else
+    def record(self, name, seconds):
+        if self.enabled:
+            self.buffer(name).add(seconds)
+
+    def count(self, name, amount=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    # p50, p95 and p99 of the given span, in seconds
+    def percentiles(self, name):
+        buffer = self.spans.get(name)
+        if buffer is None:
+            return (0.0, 0.0, 0.0)
+        return buffer.percentiles(50, 95, 99)
+
+    # One-line summary of the given spans, in milliseconds
+    def statusLine(self, names):
+        parts = []
+        for name in names:
+            p50, p95, p99 = self.percentiles(name)
+            parts.append("%s %.1f/%.1f/%.1f"%(name, p50*1e3, p95*1e3, p99*1e3))
+        return "# " + " | ".join(parts) + " ms"
+
+    def snapshot(self):
+        spans = {}
+        for name, buffer in self.spans.items():
+            p50, p95, p99 = buffer.percentiles(50, 95, 99)
+            spans[name] = {'count': buffer.count, 'p50': p50, 'p95': p95, 'p99': p99}
+        return {'spans': spans, 'counters': dict(self.counters)}
+
+    def prometheus(self):
+        lines = []
+        for name, values in sorted(self.snapshot()['spans'].items()):
+            metric = "ocala_span_seconds"
+            for q in ('p50', 'p95', 'p99'):
+                lines.append('%s{span="%s",quantile="0.%s"} %.9f'%(metric, name, q[1:], values[q]))
+            lines.append('%s_count{span="%s"} %d'%(metric, name, values['count']))
+        for name, total in sorted(self.counters.items()):
+            lines.append('ocala_%s_total %d'%(name, total))
+        return '\n'.join(lines) + '\n'
+
+    # Writes everything to path, in the Prometheus text format if it ends in .prom and as JSON otherwise
+    def dump(self, path):
+        with open(path, 'w') as f:
+            if path.endswith('.prom'):
+                f.write(self.prometheus())
+            else:
+                json.dump(self.snapshot(), f, indent=2, sort_keys=True)
@@ -0,0 +1,117 @@
+##########################
+###    Progression     ###
+##########################
+
+# Per-level tables of the experience needed and of the stats reached, computed once out of a player's
+# starting stats with the same arithmetic a level up always used (minExp grows by 35%, max HP and MP
+# by int(10%), attacks by int(15%)), so the numbers are exactly the ones levelling one at a time gave.
+#
+# The tables hold the total experience needed to reach each level from level 1, so the level a grant
+# of experience ends at is a binary search away however many levels it crosses, and the stats at any
+# level are a lookup. They're built up to MAX_LEVEL, and extended if a player ever goes past it
+
+from array import array
+from bisect import bisect_right
+
+# Levels the tables are built for up front
+MAX_LEVEL = 100
+# Experience needed to go from level 1 to 2
+FIRST_LEVELUP = 10.0
+# Growth of each value per level
+EXP_GROWTH = 0.35
+HP_GROWTH = 0.1
+MP_GROWTH = 0.1
+ATTACK_GROWTH = 0.15
+
+
+# Tables of a player starting with the given stats, indexed by level (index 0 is unused)
+class Progression():
+
+    def __init__(self, hp, mp, minAttack, maxAttack, minExp=FIRST_LEVELUP, levels=MAX_LEVEL):
+        # Experience needed to level up from each level
+        self.minExp = array('d', [0.0, minExp])
+        # Total experience needed to reach each level from level 1 with no experience
+        self.threshold = array('d', [0.0, 0.0])
+        self.MAXHP = array('q', [0, hp])
+        self.MAXMP = array('q', [0, mp])
+        self.minAttack = array('q', [0, minAttack])
+        self.maxAttack = array('q', [0, maxAttack])
+        self.extend(levels)
+
+    # Highest level in the tables
+    @property
+    def maxLevel(self):
+        return len(self.threshold) - 1
+
+    # Builds the tables up to level
+    def extend(self, level):
+        minExp, threshold = self.minExp, self.threshold
+        MAXHP, MAXMP = self.MAXHP, self.MAXMP
+        minAttack, maxAttack = self.minAttack, self.maxAttack
+        while len(threshold) <= level:
+            last = len(threshold) - 1
+            threshold.append(threshold[last] + minExp[last])
+            minExp.append(minExp[last] + minExp[last]*EXP_GROWTH)
+            MAXHP.append(MAXHP[last] + int(MAXHP[last]*HP_GROWTH))
+            MAXMP.append(MAXMP[last] + int(MAXMP[last]*MP_GROWTH))
+            minAttack.append(minAttack[last] + int(minAttack[last]*ATTACK_GROWTH))
+            maxAttack.append(maxAttack[last] + int(maxAttack[last]*ATTACK_GROWTH))
+
+    # (MAXHP, MAXMP, minAttack, maxAttack) at level
+    def stats(self, level):
+        if level > self.maxLevel:
+            self.extend(level)
+        return self.MAXHP[level], self.MAXMP[level], self.minAttack[level], self.maxAttack[level]
+
+    # Level reached with total experience since level 1
+    def levelAt(self, total):
+        threshold = self.threshold
+        while total >= threshold[-1]:
+            self.extend(2*self.maxLevel)
+        return bisect_right(threshold, total, 1) - 1
+
+    # Puts player at level, with its stats and HP/MP refilled, leaving its experience alone
+    def setLevel(self, player, level):
+        if level > self.maxLevel:
+            self.extend(level)
+        player.level = level
+        player.minExp = self.minExp[level]
+        player.MAXHP, player.MAXMP = self.MAXHP[level], self.MAXMP[level]
+        player.minAttack, player.maxAttack = self.minAttack[level], self.maxAttack[level]
+        player.hp = player.MAXHP
+        player.mp = player.MAXMP
+
+    # Gives amount experience to player, levelling it up as many times as it takes. Returns the
+    # amount of levels gained
+    def grant(self, player, amount):
+        level = player.level
+        exp = player.exp + amount
+        if exp < player.minExp:
+            player.exp = exp
+            return 0
+        total = self.threshold[level] + exp
+        reached = self.levelAt(total)
+        if reached <= level:
+            # Rounding put it right under the next threshold, it's one level up all the same
+            reached = level + 1
+        player.exp = max(0.0, total - self.threshold[reached])
+        self.setLevel(player, reached)
+        return reached - level
+
+
+# Tables already built, by starting stats
+PROGRESSIONS = {}
+
+# Progression of a player starting with the given stats, built the first time
+def progressionFor(hp, mp, minAttack, maxAttack):
+    key = (hp, mp, minAttack, maxAttack)
+    progression = PROGRESSIONS.get(key)
+    if progression is None:
+        progression = PROGRESSIONS[key] = Progression(hp, mp, minAttack, maxAttack)
+    return progression
+
+# Gives amounts[i] experience to players[i], for quest or event rewards handed out to many players at
+# once. Goes through Player.grantExp, so level ups keep the buffs going on and are announced. Returns
+# the levels each of them gained
+def grantMany(players, amounts):
+    return [player.grantExp(amount) for player, amount in zip(players, amounts)]
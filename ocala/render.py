@@ -0,0 +1,136 @@
+##########################
+###     Renderer       ###
+##########################
+
+# Frame-buffer renderer, every frame is diffed against the previous one and only the changed
+# cells are sent to the terminal, using ANSI cursor addressing, in a single write
+
+import sys
+
+# String representation of every tile code, mobs add theirs as they're registered (see setGlyph)
+# // TODO: Add colours to each individual type of character
+GLYPHS = {0: '#',
+          1: ' ',
+          2: '@',
+          5: 'M',
+          }
+# Glyph of codes missing from GLYPHS, so they stand out instead of shifting the row
+UNKNOWN = '?'
+
+# Builds a 256-byte table for bytes.translate() out of a code -> glyph dict
+def glyphTable(glyphs):
+    return bytearray(ord(glyphs.get(code, UNKNOWN)) for code in range(256))
+
+GLYPH_TABLE = glyphTable(GLYPHS)
+
+# Raises ValueError unless glyph can stand for a tile, a single one-byte character
+def checkGlyph(glyph):
+    if not isinstance(glyph, str) or len(glyph) != 1 or ord(glyph) > 255:
+        raise ValueError("Glyphs are single characters, got %r"%(glyph,))
+
+# Shows code as glyph from now on, the table is updated in place so every renderRow() sees it
+def setGlyph(code, glyph):
+    checkGlyph(glyph)
+    GLYPHS[code] = glyph
+    GLYPH_TABLE[code] = ord(glyph)
+
+# Turns a row of tile codes (bytes) into its string representation
+def renderRow(codes, table=GLYPH_TABLE):
+    return codes.translate(table).decode('latin-1')
+
+# ANSI escape sequences
+CLEAR = '\x1b[2J'
+ERASE_LINE = '\x1b[K'
+ERASE_BELOW = '\x1b[J'
+
+# Moves the cursor to the given row and column, both starting at 0
+def moveTo(row, column):
+    return '\x1b[%d;%dH'%(row+1, column+1)
+
+
+class Renderer():
+
+    def __init__(self, out=None):
+        self.out = out if out is not None else sys.stdout
+        # Lines of the last frame written to the terminal, None until the first frame
+        self.previous = None
+        # Cells and bytes sent in the last frame, for telemetry
+        self.cellsDrawn = 0
+        self.bytesWritten = 0
+
+    # Forces the next frame to be redrawn from scratch (i.e: after something else wrote to the screen)
+    def invalidate(self):
+        self.previous = None
+
+    # Diffs the given lines against the previous frame and writes the changes
+    def draw(self, lines):
+        previous = self.previous
+        cells = 0
+        if previous is None:
+            chunks = [CLEAR, moveTo(0, 0)]
+            for row, line in enumerate(lines):
+                chunks.append(moveTo(row, 0))
+                chunks.append(line)
+                cells += len(line)
+        else:
+            chunks = []
+            for row, line in enumerate(lines):
+                old = previous[row] if row < len(previous) else ''
+                if line == old:
+                    continue
+                # Finds the first and last differing columns, only the cells in between are sent
+                size = min(len(line), len(old))
+                first = 0
+                while first < size and line[first] == old[first]:
+                    first += 1
+                last = len(line)
+                if len(line) == len(old):
+                    while last > first and line[last-1] == old[last-1]:
+                        last -= 1
+                chunks.append(moveTo(row, first))
+                chunks.append(line[first:last])
+                cells += last - first
+                if len(line) < len(old):
+                    chunks.append(ERASE_LINE)
+            for row in range(len(lines), len(previous)):
+                chunks.append(moveTo(row, 0))
+                chunks.append(ERASE_LINE)
+            if not chunks:
+                # Nothing changed, an idle frame sends nothing at all
+                self.cellsDrawn = self.bytesWritten = 0
+                return 0
+        # Leaves the cursor under the frame, and erases anything printed there since the last frame
+        chunks.append(moveTo(len(lines), 0))
+        chunks.append(ERASE_BELOW)
+        data = ''.join(chunks)
+        self.out.write(data)
+        self.out.flush()
+        self.previous = list(lines)
+        self.cellsDrawn = cells
+        self.bytesWritten = len(data)
+        return len(data)
+
+
+# Keeps the last lines written to it, so messages can be drawn as part of the frame instead of
+# being printed over it. Meant to replace sys.stdout while the game loop runs
+class MessageLog():
+
+    def __init__(self, size=5):
+        self.size = size
+        self.messages = []
+        self.partial = ''
+
+    def write(self, text):
+        lines = (self.partial + text).split('\n')
+        self.partial = lines.pop()
+        self.messages.extend(line for line in lines if line)
+        if len(self.messages) > self.size:
+            del self.messages[:-self.size]
+        return len(text)
+
+    def flush(self):
+        pass
+
+    # Returns the last messages, oldest first
+    def lines(self):
+        return list(self.messages)
@@ -0,0 +1,201 @@
+##########################
+###  Record & Replay   ###
+##########################
+
+# Recordings of local games, replayed headless and as fast as possible. The game only depends on the
+# seed of the random module and on the keys pressed, and the scheduler ticks the world a fixed step at
+# a time, so a recording is just the seed and every key along with the tick it came in. A hash of the
+# state is recorded after each tick as well, and replays check theirs against it, so the first tick
+# at which a replay went a different way is known straight away.
+#
+#   OCALA_RECORD=bug.ocr python -m ocala                # plays a new game, recording it
+#   python -m ocala.replay bug.ocr                      # replays it, checking every tick
+#
+# File format, little-endian:
+#   header - magic (4s), version (H), seed (I), tick rate (H)
+#   events - kind (B), ticks since the previous event (varint), then depending on the kind:
+#            KEY: length (varint) and UTF-8 bytes of the key, HASH: CRC32 of the state (I), END: nothing
+
+import argparse
+import io
+import random
+import struct
+import sys
+import time
+import zlib
+from contextlib import redirect_stdout
+
+MAGIC = b'OCRP'
+VERSION = 1
+HEADER = struct.Struct('<4sHIH')
+KEY, HASH, END = 1, 2, 3
+CRC = struct.Struct('<I')
+# What's hashed of every entity on the current map, and of the player
+ENTITY_STATE = struct.Struct('<iiHiib')
+PLAYER_STATE = struct.Struct('<iiiiiid')
+
+
+class ReplayError(Exception):
+    pass
+
+
+def encodeVarint(value):
+    out = bytearray()
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+# Reads a varint out of data at offset, returns it and the offset past it
+def decodeVarint(data, offset):
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+# CRC32 of what a session's player can see and do: the player, the entities on the current map (by
+# position, so IDs handed out elsewhere don't matter) and the battle going on
+def stateHash(session):
+    player = session.player
+    crc = zlib.crc32(PLAYER_STATE.pack(player.hp, player.mp, player.MAXHP, player.MAXMP, player.level,
+                                       len(player.backpack.byID), player.exp))
+    crc = zlib.crc32(player.backpack.describe().encode('utf-8'), crc)
+    entities = session.maps["Current"].index.entities.values()
+    for e in sorted(entities, key=lambda e: (e.coords[1], e.coords[0])):
+        crc = zlib.crc32(ENTITY_STATE.pack(e.coords[0], e.coords[1], e.rep, e.hp, e.mp, e.dead), crc)
+    fight = session.battle
+    if fight is not None:
+        crc = zlib.crc32(struct.pack('<dBB', fight.resumeAt, fight.finished, fight.over), crc)
+    return crc
+
+
+# Writes a recording as the game goes
+class Recorder():
+
+    def __init__(self, path, tickRate, seed=None):
+        self.path = path
+        self.seed = seed if seed is not None else random.randrange(2**32)
+        self.tickRate = tickRate
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, VERSION, self.seed, tickRate))
+        self.lastTick = 0
+
+    def event(self, kind, tick, payload=b''):
+        self.file.write(bytes((kind,)) + encodeVarint(tick - self.lastTick) + payload)
+        self.lastTick = tick
+
+    # Keys are stamped with the ticks done when they came in, they're replayed right before the next one
+    def key(self, tick, key):
+        data = key.encode('utf-8')
+        self.event(KEY, tick, encodeVarint(len(data)) + data)
+
+    def tick(self, tick, crc):
+        self.event(HASH, tick, CRC.pack(crc))
+
+    # Records the session's keys and its state after every tick. Systems added later aren't hashed
+    def attach(self, session):
+        scheduler = session.scheduler
+        scheduler.onKey(lambda key: self.key(scheduler.ticks, key))
+        scheduler.addSystem("record", lambda now, dt: self.tick(scheduler.ticks, stateHash(session)))
+
+    def close(self, ticks=None):
+        if self.file.closed:
+            return
+        self.event(END, ticks if ticks is not None else self.lastTick)
+        self.file.close()
+
+
+# A recording read back
+class Recording():
+
+    def __init__(self, seed, tickRate):
+        self.seed = seed
+        self.tickRate = tickRate
+        # tick -> keys that came in once that many ticks were done
+        self.keys = {}
+        # tick -> hash of the state right after it
+        self.hashes = {}
+        self.ticks = 0
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, version, seed, tickRate = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError("%s is not a recording"%path)
+        if version != VERSION:
+            raise ValueError("Unsupported recording version %d"%version)
+        recording = cls(seed, tickRate)
+        offset, tick = HEADER.size, 0
+        # A recording cut short (i.e: the game crashed) is replayed up to its last complete event
+        try:
+            while offset < len(data):
+                kind = data[offset]
+                delta, offset = decodeVarint(data, offset + 1)
+                tick += delta
+                if kind == KEY:
+                    size, offset = decodeVarint(data, offset)
+                    recording.keys.setdefault(tick, []).append(data[offset:offset + size].decode('utf-8'))
+                    offset += size
+                elif kind == HASH:
+                    recording.hashes[tick] = CRC.unpack_from(data, offset)[0]
+                    offset += CRC.size
+                elif kind == END:
+                    break
+                else:
+                    raise ValueError("Unknown event %d in %s"%(kind, path))
+                recording.ticks = max(recording.ticks, tick)
+        except (IndexError, struct.error):
+            pass
+        return recording
+
+
+# Replays the recording at path with no clock, screen or input, as fast as it goes. Raises ReplayError
+# at the first tick whose state doesn't match the recorded one, unless check is False.
+# Returns (ticks, seconds)
+def replay(path, check=True):
+    from . import Game
+    recording = Recording.load(path)
+    if recording.tickRate != Game.TICK_RATE:
+        raise ReplayError("Recorded at %d ticks per second, the game runs at %d"%(recording.tickRate, Game.TICK_RATE))
+    random.seed(recording.seed)
+    session = Game.newGame()
+    session.renderer.out = io.StringIO()
+    scheduler = session.scheduler
+    scheduler.addSystem("deaths", Game.sweepDead, Game.MOB_STEP)
+    keys, hashes = recording.keys, recording.hashes
+    start = time.perf_counter()
+    with redirect_stdout(session.messages):
+        for i in range(recording.ticks):
+            pending = keys.get(scheduler.ticks)
+            if pending:
+                scheduler.dispatch(pending)
+            scheduler.tick()
+            expected = hashes.get(scheduler.ticks)
+            if check and expected is not None and stateHash(session) != expected:
+                raise ReplayError("The replay went a different way at tick %d"%scheduler.ticks)
+    return scheduler.ticks, time.perf_counter() - start
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replays a recorded game of The Story of Ocala")
+    parser.add_argument('path')
+    parser.add_argument('--no-check', action='store_true', help="doesn't compare the state hashes")
+    parser.add_argument('--repeat', type=int, default=1, help="replays it this many times, for timing")
+    args = parser.parse_args(argv)
+    for i in range(args.repeat):
+        try:
+            ticks, seconds = replay(args.path, check=not args.no_check)
+        except ReplayError as e:
+            print(e)
+            return 1
+        print("%d ticks in %.3f s, %.0f ticks/s"%(ticks, seconds, ticks/seconds if seconds else 0.0))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+##########################
+###     Save Games     ###
+##########################
+
+# Compact binary save files. A save file is a header followed by snapshots, each snapshot being a
+# list of records closed by an END record. The first snapshot holds the whole world, every later one
+# (a delta) only holds the settings of each map and what changed since the previous save: entity
+# records that differ, entities that are gone, and the rows of terrain that were modified. Loading
+# replays the snapshots in order, a snapshot cut short (i.e: the game crashed while saving) is ignored.
+#
+# Chunked worlds are too big to go in the save, their terrain stays in their chunk file. Snapshots
+# only hold the chunks modified since the previous save, and the chunk file gets them once the
+# snapshot is written, so it always matches the last save. Loading writes the chunks of the save
+# back into the chunk file, which drops anything changed since and finishes a save cut short.
+#
+# Every record is kind (B), payload length (I) and the payload, little-endian:
+#   COUNTERS - ID, ITEM_ID, SKILL_ID, MAP_ID (IIII)
+#   MAP      - map ID (I), spawnSpots (I), spawnSet (B), width (I), height (I), name, chunk file path,
+#              amount of spawnable mobs (H) and their representations (H each)
+#   TERRAIN  - map ID (I), first row (I), raw terrain bytes of whole rows
+#   CHUNK    - map ID (I), chunk x (H), chunk y (H), raw terrain bytes of the chunk
+#   ENTITY   - ENTITY_STRUCT fields, a name, then for players the PLAYER_STRUCT fields, backpack slots and skills
+#   REMOVED  - entity ID (I)
+#   STATE    - current map ID (I), player ID (I)
+# Strings are stored as their length (H) followed by their UTF-8 bytes
+
+import os
+import struct
+
+MAGIC = b'OCSV'
+VERSION = 1
+HEADER = struct.Struct('<4sH')
+RECORD = struct.Struct('<BI')
+
+# Record kinds
+COUNTERS, MAP, TERRAIN, ENTITY, REMOVED, STATE, END, CHUNK = range(1, 9)
+
+# Snapshots written before the save file is started over with a whole one, so it doesn't keep growing
+# with deltas and loading doesn't replay them all
+COMPACT_AFTER = 120
+
+# Entity kinds
+PLAYER_KIND, MOB_KIND = 0, 1
+
+COUNTERS_STRUCT = struct.Struct('<IIII')
+MAP_STRUCT = struct.Struct('<IIBII')
+TERRAIN_STRUCT = struct.Struct('<II')
+CHUNK_STRUCT = struct.Struct('<IHH')
+# ID, kind, map ID (-1 if none), x, y, rep, hp, mp, MAXHP, MAXMP, minAttack, maxAttack, dead
+ENTITY_STRUCT = struct.Struct('<IBiiiHiiiiiiB')
+# level, exp, minExp, backpack slots, skills
+PLAYER_STRUCT = struct.Struct('<IddHH')
+# item ID (-1 if the slot is empty), count
+SLOT_STRUCT = struct.Struct('<ii')
+STATE_STRUCT = struct.Struct('<II')
+ID_STRUCT = struct.Struct('<I')
+LENGTH_STRUCT = struct.Struct('<H')
+
+def packString(text):
+    data = text.encode('utf-8')
+    return LENGTH_STRUCT.pack(len(data)) + data
+
+def unpackString(data, offset):
+    size, = LENGTH_STRUCT.unpack_from(data, offset)
+    offset += LENGTH_STRUCT.size
+    return data[offset:offset+size].decode('utf-8'), offset + size
+
+def record(kind, payload):
+    return RECORD.pack(kind, len(payload)) + payload
+
+# Payload of an entity record, players also carry their level, backpack and skills
+def packEntity(entity, isPlayer):
+    mapID = entity.map.ID if entity.map is not None else -1
+    payload = [ENTITY_STRUCT.pack(entity.ID, PLAYER_KIND if isPlayer else MOB_KIND, mapID,
+                                  entity.coords[0], entity.coords[1], entity.rep, entity.hp, entity.mp,
+                                  entity.MAXHP, entity.MAXMP, entity.minAttack, entity.maxAttack, entity.dead),
+               packString(entity.name)]
+    if isPlayer:
+        backpack = entity.backpack
+        payload.append(PLAYER_STRUCT.pack(entity.level, entity.exp, entity.minExp, backpack.slots, len(entity.skills)))
+        payload.extend(SLOT_STRUCT.pack(i, n) for i, n in zip(backpack.itemIDs, backpack.counts))
+        payload.extend(ID_STRUCT.pack(s.ID) for s in entity.skills)
+    return b''.join(payload)
+
+def unpackEntity(data):
+    fields = ENTITY_STRUCT.unpack_from(data, 0)
+    entity = dict(zip(('ID', 'kind', 'map', 'x', 'y', 'rep', 'hp', 'mp', 'MAXHP', 'MAXMP',
+                       'minAttack', 'maxAttack', 'dead'), fields))
+    entity['dead'] = bool(entity['dead'])
+    entity['name'], offset = unpackString(data, ENTITY_STRUCT.size)
+    if entity['kind'] == PLAYER_KIND:
+        level, exp, minExp, slots, skills = PLAYER_STRUCT.unpack_from(data, offset)
+        offset += PLAYER_STRUCT.size
+        entity.update(level=level, exp=exp, minExp=minExp)
+        entity['backpack'] = [SLOT_STRUCT.unpack_from(data, offset + i*SLOT_STRUCT.size) for i in range(slots)]
+        offset += slots*SLOT_STRUCT.size
+        entity['skills'] = [ID_STRUCT.unpack_from(data, offset + i*ID_STRUCT.size)[0] for i in range(skills)]
+    return entity
+
+# What a save file holds once loaded, as plain data
+class SaveData():
+
+    def __init__(self):
+        self.counters = (0, 0, 0, 0)
+        # map ID -> dict with the map's settings and its terrain (bytearray), or the chunks saved of
+        # its chunk file by chunk key
+        self.maps = {}
+        # entity ID -> dict with the entity's fields
+        self.entities = {}
+        self.currentMap = None
+        self.player = None
+
+    # Applies the records of a complete snapshot
+    def apply(self, records):
+        for kind, payload in records:
+            if kind == COUNTERS:
+                self.counters = COUNTERS_STRUCT.unpack(payload)
+            elif kind == MAP:
+                ID, spawnSpots, spawnSet, width, height = MAP_STRUCT.unpack_from(payload, 0)
+                name, offset = unpackString(payload, MAP_STRUCT.size)
+                chunkFile, offset = unpackString(payload, offset)
+                count, = LENGTH_STRUCT.unpack_from(payload, offset)
+                spawnable = list(struct.unpack_from('<%dH'%count, payload, offset + LENGTH_STRUCT.size))
+                info = self.maps.setdefault(ID, {'terrain': None, 'chunks': {}})
+                if not chunkFile and info['terrain'] is None:
+                    info['terrain'] = bytearray(width*height)
+                info.update(ID=ID, name=name, spawnSpots=spawnSpots, spawnSet=bool(spawnSet), width=width,
+                            height=height, chunkFile=chunkFile or None, spawnableMobs=spawnable)
+            elif kind == TERRAIN:
+                ID, row = TERRAIN_STRUCT.unpack_from(payload, 0)
+                info = self.maps[ID]
+                start = row*info['width']
+                data = payload[TERRAIN_STRUCT.size:]
+                info['terrain'][start:start+len(data)] = data
+            elif kind == CHUNK:
+                ID, cx, cy = CHUNK_STRUCT.unpack_from(payload, 0)
+                self.maps[ID]['chunks'][(cx, cy)] = payload[CHUNK_STRUCT.size:]
+            elif kind == ENTITY:
+                entity = unpackEntity(payload)
+                self.entities[entity['ID']] = entity
+            elif kind == REMOVED:
+                self.entities.pop(ID_STRUCT.unpack(payload)[0], None)
+            elif kind == STATE:
+                self.currentMap, self.player = STATE_STRUCT.unpack(payload)
+
+# Reads every complete snapshot of the save file at path
+def load(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, version = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("%s is not a save file"%path)
+    if version != VERSION:
+        raise ValueError("Unsupported save file version %d"%version)
+    save = SaveData()
+    offset = HEADER.size
+    pending = []
+    while offset + RECORD.size <= len(data):
+        kind, size = RECORD.unpack_from(data, offset)
+        offset += RECORD.size
+        if offset + size > len(data):
+            break
+        if kind == END:
+            save.apply(pending)
+            pending = []
+        else:
+            pending.append((kind, data[offset:offset+size]))
+        offset += size
+    return save
+
+# Writes snapshots of the world to a save file, the first one whole and the following ones as deltas
+class SaveFile():
+
+    def __init__(self, path):
+        self.path = path
+        # entity ID -> last record written, to tell which entities changed
+        self.written = {}
+        # IDs of the maps whose terrain is in the file
+        self.mapsWritten = set()
+        self.snapshots = 0
+
+    # Builds the records of a snapshot. maps are Map objects, entities are (entity, isPlayer) pairs
+    def records(self, counters, maps, entities, currentMap, player):
+        records = [record(COUNTERS, COUNTERS_STRUCT.pack(*counters))]
+        for m in maps:
+            grid = m.grid
+            chunkFile = getattr(grid, 'file', None)
+            path = chunkFile.path if chunkFile is not None else ''
+            spawnable = struct.pack('<H%dH'%len(m.spawnableMobs), len(m.spawnableMobs), *m.spawnableMobs)
+            records.append(record(MAP, MAP_STRUCT.pack(m.ID, m.spawnSpots, m.spawnSet, grid.width, grid.height)
+                                  + packString(m.name) + packString(path) + spawnable))
+            if chunkFile is not None:
+                # Chunked worlds keep their terrain in their own file, only the modified chunks are saved
+                for (cx, cy), terrain in sorted(grid.modifiedChunks().items()):
+                    records.append(record(CHUNK, CHUNK_STRUCT.pack(m.ID, cx, cy) + bytes(terrain)))
+            elif m.ID not in self.mapsWritten:
+                records.append(record(TERRAIN, TERRAIN_STRUCT.pack(m.ID, 0) + bytes(grid.terrain)))
+                self.mapsWritten.add(m.ID)
+                grid.changedRows.clear()
+            elif grid.changedRows:
+                for row in sorted(grid.changedRows):
+                    start = row*grid.width
+                    records.append(record(TERRAIN, TERRAIN_STRUCT.pack(m.ID, row) + bytes(grid.terrain[start:start+grid.width])))
+                grid.changedRows.clear()
+        seen = set()
+        for entity, isPlayer in entities:
+            seen.add(entity.ID)
+            payload = packEntity(entity, isPlayer)
+            if self.written.get(entity.ID) != payload:
+                self.written[entity.ID] = payload
+                records.append(record(ENTITY, payload))
+        for ID in [ID for ID in self.written if ID not in seen]:
+            del self.written[ID]
+            records.append(record(REMOVED, ID_STRUCT.pack(ID)))
+        records.append(record(STATE, STATE_STRUCT.pack(currentMap.ID, player.ID)))
+        records.append(record(END, b''))
+        return records
+
+    # Writes a snapshot, the whole world the first time and only the changes afterwards. Whole snapshots
+    # go to a new file that replaces the old one once complete, so the save already there is never
+    # lost to a crash while writing
+    def save(self, counters, maps, entities, currentMap, player, sync=False):
+        records = self.records(counters, maps, entities, currentMap, player)
+        if self.snapshots:
+            with open(self.path, 'ab') as f:
+                f.write(b''.join(records))
+                if sync:
+                    f.flush()
+                    os.fsync(f.fileno())
+        else:
+            temporary = self.path + ".tmp"
+            with open(temporary, 'wb') as f:
+                f.write(HEADER.pack(MAGIC, VERSION))
+                f.write(b''.join(records))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporary, self.path)
+        # The modified chunks are in the save, the chunk files can have them now
+        for m in maps:
+            if getattr(m.grid, 'file', None) is not None:
+                m.grid.flush()
+        self.snapshots += 1
+        return sum(len(r) for r in records)
+
+    # Starts over with a whole snapshot, so the file doesn't keep growing with deltas
+    def compact(self):
+        self.written = {}
+        self.mapsWritten = set()
+        self.snapshots = 0
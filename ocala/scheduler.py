@@ -0,0 +1,158 @@
+##########################
+###     Scheduler      ###
+##########################
+
+# Fixed-timestep game loop. The simulation ticks at a fixed rate, the screen is drawn at its own
+# rate, and input is polled without blocking, so the world keeps going between keypresses.
+# When the loop falls behind, missed ticks are caught up, but only up to maxCatchUp per pass
+
+import time
+from .profiling import Profiler
+
+# Default rates, in ticks/frames per second
+TICK_RATE = 20
+FRAME_RATE = 30
+# Most ticks run in a single pass of the loop before the remaining lag is dropped
+MAX_CATCH_UP = 5
+# Slack allowed when checking whether an interval went by, so float rounding never costs a tick
+EPSILON = 1e-9
+
+# A per-system update hook, called with the scheduler's clock and the time since its last run, which
+# is its interval for the systems that have one
+class System():
+
+    def __init__(self, name, update, interval):
+        self.name = name
+        self.update = update
+        # Seconds between runs, None to run every tick
+        self.interval = interval
+        self.elapsed = 0.0
+
+
+class Scheduler():
+
+    def __init__(self, tickRate=TICK_RATE, frameRate=FRAME_RATE, maxCatchUp=MAX_CATCH_UP, clock=time.monotonic, profiler=None):
+        self.tickLength = 1.0/tickRate
+        self.frameLength = 1.0/frameRate if frameRate else None
+        self.maxCatchUp = maxCatchUp
+        self.clock = clock
+        # Every tick, system, frame and batch of keys is timed under its own span
+        self.profiler = profiler if profiler is not None else Profiler()
+        self.systems = []
+        self.keyHandlers = []
+        self.renderers = []
+        self.running = False
+        # Simulation time, advances exactly tickLength per tick
+        self.now = 0.0
+        self.ticks = 0
+        self.frames = 0
+        # Clock times at which the next tick and frame are due, set when the loop starts
+        self.nextTick = 0.0
+        self.nextFrame = 0.0
+        # Ticks dropped because the loop fell too far behind
+        self.droppedTicks = 0
+
+    # Registers a system, update(now, dt) runs every tick, or every interval seconds if given
+    def addSystem(self, name, update, interval=None):
+        self.systems.append(System(name, update, interval))
+
+    def removeSystem(self, name):
+        self.systems = [s for s in self.systems if s.name != name]
+
+    # Registers a handler called with every key read from the input
+    def onKey(self, handler):
+        self.keyHandlers.append(handler)
+
+    # Registers a function drawing a frame
+    def onRender(self, render):
+        self.renderers.append(render)
+
+    def stop(self):
+        self.running = False
+
+    # Advances the simulation by a single tick
+    def tick(self):
+        dt = self.tickLength
+        self.now += dt
+        self.ticks += 1
+        profiler = self.profiler
+        with profiler.span("tick"):
+            for system in self.systems:
+                if system.interval is None:
+                    with profiler.span(system.name):
+                        system.update(self.now, dt)
+                else:
+                    system.elapsed += dt
+                    if system.elapsed >= system.interval - EPSILON:
+                        with profiler.span(system.name):
+                            system.update(self.now, system.interval)
+                        # What went past the interval counts towards the next run, so runs don't drift.
+                        # Systems running more often than the ticks just run every tick
+                        system.elapsed = min(system.elapsed - system.interval, system.interval)
+
+    # Passes the given keys to every key handler
+    def dispatch(self, keys):
+        if not keys:
+            return
+        self.profiler.count("keys", len(keys))
+        with self.profiler.span("input"):
+            for key in keys:
+                for handler in self.keyHandlers:
+                    handler(key)
+
+    def render(self):
+        self.frames += 1
+        with self.profiler.span("frame"):
+            for render in self.renderers:
+                render()
+
+    # Runs the ticks due at the given clock time, catching up to maxCatchUp of them, and the frame if
+    # it's due as well. Returns the clock time at which something is due next
+    def advance(self, now):
+        steps = 0
+        while now >= self.nextTick and steps < self.maxCatchUp and self.running:
+            self.tick()
+            self.nextTick += self.tickLength
+            steps += 1
+        if now >= self.nextTick:
+            # Too far behind, the lag is dropped instead of spiraling
+            behind = int((now - self.nextTick)/self.tickLength) + 1
+            self.droppedTicks += behind
+            self.nextTick += behind*self.tickLength
+        if self.frameLength is not None and now >= self.nextFrame:
+            self.render()
+            self.nextFrame = max(self.nextFrame + self.frameLength, now)
+        return self.nextTick if self.frameLength is None else min(self.nextTick, self.nextFrame)
+
+    def start(self):
+        self.running = True
+        now = self.clock()
+        self.nextTick = now + self.tickLength
+        self.nextFrame = now
+        return now
+
+    # Runs the loop until stop() is called. keys is the input source, its poll(timeout) waits at most
+    # timeout seconds for input and returns the keys read, if it's None the loop just sleeps. Keys the
+    # input holds back for later (its pending ones, i.e: the repeats of a key held down) are let
+    # through once per tick, a backlog of them is spread over the ticks instead of handled at once
+    def run(self, keys=None):
+        wake = self.start()
+        polled = -1
+        while self.running:
+            timeout = max(0.0, wake - self.clock())
+            if keys is not None and (self.ticks != polled or not getattr(keys, 'pending', None)):
+                polled = self.ticks
+                self.dispatch(keys.poll(timeout))
+            elif timeout:
+                time.sleep(timeout)
+            wake = self.advance(self.clock())
+
+    # Same loop as run(), for asyncio: it waits by awaiting instead of blocking, so other tasks (i.e:
+    # network connections) go on in between. Keys are expected to be dispatched by those tasks
+    async def runAsync(self):
+        # Only imported when used, asyncio takes longer to import than the rest of the game
+        import asyncio
+        wake = self.start()
+        while self.running:
+            await asyncio.sleep(max(0.0, wake - self.clock()))
+            wake = self.advance(self.clock())
@@ -0,0 +1,247 @@
+##########################
+###    Game Server     ###
+##########################
+
+# Hosts many players at once over TCP, telnet clients included. Every connection gets a session of its
+# own (see Game.Session): its own player, maps, battle and screen, drawn with its own diff renderer.
+# A single asyncio loop ticks every session and nothing in it ever blocks: each connection reads its
+# keys in a task of its own and queues them for the next tick, and frames are written without waiting
+# for the client, a client too slow to keep up just has its frames skipped until it catches up.
+#
+#   python -m ocala.server --port 4000    # then: telnet localhost 4000
+#
+# Ctrl-C or Ctrl-D ends a connection. LoopbackClient connects to a server in the same process, for testing
+
+import argparse
+import asyncio
+from collections import deque
+from contextlib import redirect_stdout
+
+from . import Game
+from .scheduler import Scheduler
+
+HOST = "127.0.0.1"
+PORT = 4000
+# Most sessions open at once, connections past it are turned away
+MAX_SESSIONS = 1000
+# Keys queued per session between two ticks, the oldest ones are dropped past it
+MAX_KEYS = 32
+# Bytes left unsent to a client past which its frames are skipped
+MAX_PENDING = 64*1024
+# Keys ending a connection, Ctrl-C and Ctrl-D
+QUIT_KEYS = ('\x03', '\x04')
+
+# Telnet commands and options. The server offers to echo (and then doesn't) and to suppress go-ahead,
+# which gets clients out of line mode, so every key is sent as soon as it's pressed
+IAC, DONT, DO, WONT, WILL, SB, SE, IP = 255, 254, 253, 252, 251, 250, 240, 244
+ECHO, SGA, LINEMODE = 1, 3, 34
+NEGOTIATION = bytes((IAC, WILL, ECHO, IAC, WILL, SGA, IAC, DONT, LINEMODE))
+
+# Splits data read from a client into keys, leaving telnet commands out. Returns the keys and the bytes
+# of a command cut in half, to be put in front of the next read
+def telnetKeys(data):
+    keys = []
+    i, size = 0, len(data)
+    while i < size:
+        byte = data[i]
+        if byte != IAC:
+            # Telnet ends lines with CR NUL or CR LF, only the CR is kept
+            if byte not in (0, 10):
+                keys.append(chr(byte))
+            i += 1
+            continue
+        if i+1 >= size:
+            break
+        command = data[i+1]
+        if command == IAC:
+            keys.append(chr(IAC))
+            i += 2
+        elif command in (DO, DONT, WILL, WONT):
+            if i+2 >= size:
+                break
+            i += 3
+        elif command == SB:
+            end = data.find(bytes((IAC, SE)), i+2)
+            if end < 0:
+                break
+            i = end + 2
+        else:
+            if command == IP:
+                keys.append(QUIT_KEYS[0])
+            i += 2
+    return keys, data[i:]
+
+
+# File-like object a session's renderer draws on, sending everything to the client without waiting
+class ClientOutput():
+
+    def __init__(self, writer):
+        self.writer = writer
+
+    def write(self, text):
+        data = text.encode('latin-1', 'replace')
+        self.writer.write(data)
+        return len(text)
+
+    def flush(self):
+        pass
+
+    # Bytes written but not sent yet
+    def pending(self):
+        return self.writer.transport.get_write_buffer_size()
+
+
+class Connection():
+
+    def __init__(self, session, output):
+        self.session = session
+        self.output = output
+        # Keys read since the last tick
+        self.keys = deque(maxlen=MAX_KEYS)
+        self.skippedFrames = 0
+
+
+class GameServer():
+
+    def __init__(self, host=HOST, port=PORT, maxSessions=MAX_SESSIONS, tickRate=Game.TICK_RATE, frameRate=Game.FRAME_RATE):
+        self.host = host
+        self.port = port
+        self.maxSessions = maxSessions
+        self.connections = []
+        self.server = None
+        self.loop = None
+        self.joined = 0
+        # Ticks every session, and renders them all once per frame
+        self.scheduler = Scheduler(tickRate, frameRate, profiler=Game.PROFILER)
+        self.scheduler.addSystem("sessions", self.tickSessions)
+        self.scheduler.addSystem("deaths", Game.sweepDead, Game.MOB_STEP)
+        self.scheduler.onRender(self.render)
+
+    # Starts listening and ticking, the port is the one actually bound (i.e: when given 0)
+    async def start(self):
+        self.server = await asyncio.start_server(self.connect, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.loop = asyncio.ensure_future(self.scheduler.runAsync())
+        return self
+
+    async def stop(self):
+        self.scheduler.stop()
+        self.server.close()
+        await self.server.wait_closed()
+        if self.loop is not None:
+            await self.loop
+        for connection in list(self.connections):
+            connection.output.writer.close()
+            self.leave(connection)
+
+    async def serveForever(self):
+        await self.start()
+        await self.loop
+
+    # Runs a connection, from its session being opened to it being closed
+    async def connect(self, reader, writer):
+        if len(self.connections) >= self.maxSessions:
+            writer.write(b"The server is full, try again later\r\n")
+            writer.close()
+            return
+        writer.write(NEGOTIATION)
+        self.joined += 1
+        output = ClientOutput(writer)
+        connection = Connection(Game.newSession("Player %d"%self.joined, output), output)
+        self.connections.append(connection)
+        try:
+            partial = b''
+            while True:
+                data = await reader.read(1024)
+                if not data:
+                    break
+                keys, partial = telnetKeys(partial + data)
+                if any(key in QUIT_KEYS for key in keys):
+                    break
+                connection.keys.extend(keys)
+        except ConnectionError:
+            pass
+        finally:
+            self.leave(connection)
+            writer.close()
+
+    def leave(self, connection):
+        if connection in self.connections:
+            self.connections.remove(connection)
+            connection.session.close()
+
+    # Passes every session the keys read since the last tick, and ticks it. Whatever the game prints
+    # goes to the message log of the session being ticked
+    def tickSessions(self, now, dt):
+        for connection in self.connections:
+            session = connection.session
+            with redirect_stdout(session.messages):
+                if connection.keys:
+                    keys = list(connection.keys)
+                    connection.keys.clear()
+                    session.scheduler.dispatch(keys)
+                session.scheduler.tick()
+
+    # Draws a frame for every client keeping up, the others get theirs once their backlog is sent
+    def render(self):
+        for connection in self.connections:
+            if connection.output.pending() > MAX_PENDING:
+                connection.skippedFrames += 1
+                continue
+            connection.session.scheduler.render()
+
+
+# Client connecting to a server, mainly one running in the same process, for testing. What the server
+# sends is kept in screen, telnet commands included
+class LoopbackClient():
+
+    def __init__(self, host=HOST, port=PORT):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+        self.screen = bytearray()
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        return self
+
+    async def send(self, keys):
+        self.writer.write(keys.encode('latin-1'))
+        await self.writer.drain()
+
+    # Reads whatever the server sends for the next timeout seconds, returns it and keeps it in screen
+    async def receive(self, timeout=0.1):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        data = bytearray()
+        try:
+            while True:
+                chunk = await asyncio.wait_for(self.reader.read(65536), max(0.0, deadline - loop.time()))
+                if not chunk:
+                    break
+                data += chunk
+        except asyncio.TimeoutError:
+            pass
+        self.screen += data
+        return bytes(data)
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Hosts The Story of Ocala over TCP/telnet")
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--max-sessions', type=int, default=MAX_SESSIONS)
+    args = parser.parse_args(argv)
+    server = GameServer(args.host, args.port, args.max_sessions)
+    try:
+        asyncio.run(server.serveForever())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+##########################
+###   Spatial Index    ###
+##########################
+
+# Keeps track of which entity stands on which cell of a map. Cells map straight to entity IDs,
+# and entities are also grouped in square buckets of the map, so range and radius queries only
+# look at the buckets they overlap instead of every entity in the map
+
+# Side of the square buckets, in cells
+BUCKET_SIZE = 16
+
+
+class SpatialIndex():
+
+    def __init__(self, bucketSize=BUCKET_SIZE):
+        self.bucketSize = bucketSize
+        # ID -> entity object
+        self.entities = {}
+        # ID -> coords the entity was indexed at
+        self.positions = {}
+        # coords -> ID
+        self.cells = {}
+        # (bucket x, bucket y) -> set of IDs
+        self.buckets = {}
+
+    def __len__(self):
+        return len(self.entities)
+
+    def __contains__(self, entity):
+        return entity.ID in self.entities
+
+    # Returns the bucket key of the given coords
+    def bucket(self, coords):
+        return (coords[0]//self.bucketSize, coords[1]//self.bucketSize)
+
+    # Indexes the entity at its current coords, or at the given ones
+    def insert(self, entity, coords=None):
+        if coords is None:
+            coords = entity.coords
+        if entity.ID in self.entities:
+            self.move(entity, coords)
+            return
+        self.entities[entity.ID] = entity
+        self.positions[entity.ID] = coords
+        self.cells[coords] = entity.ID
+        key = (coords[0]//self.bucketSize, coords[1]//self.bucketSize)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = set()
+        bucket.add(entity.ID)
+
+    # Moves an indexed entity to newCoords
+    def move(self, entity, newCoords):
+        ID = entity.ID
+        oldCoords = self.positions[ID]
+        if self.cells.get(oldCoords) == ID:
+            del self.cells[oldCoords]
+        self.cells[newCoords] = ID
+        self.positions[ID] = newCoords
+        size = self.bucketSize
+        oldKey = (oldCoords[0]//size, oldCoords[1]//size)
+        newKey = (newCoords[0]//size, newCoords[1]//size)
+        if oldKey != newKey:
+            self._discard(oldKey, ID)
+            bucket = self.buckets.get(newKey)
+            if bucket is None:
+                bucket = self.buckets[newKey] = set()
+            bucket.add(ID)
+
+    # Removes the entity from the index, returns whether it was indexed
+    def remove(self, entity):
+        ID = entity.ID
+        if ID not in self.entities:
+            return False
+        coords = self.positions.pop(ID)
+        del self.entities[ID]
+        if self.cells.get(coords) == ID:
+            del self.cells[coords]
+        self._discard(self.bucket(coords), ID)
+        return True
+
+    def _discard(self, key, ID):
+        bucket = self.buckets[key]
+        bucket.discard(ID)
+        if not bucket:
+            del self.buckets[key]
+
+    # Returns the entity standing at the given coords, or None
+    def at(self, coords):
+        ID = self.cells.get(coords)
+        if ID is None:
+            return None
+        return self.entities[ID]
+
+    # Returns the entities inside the rectangle going from (x0, y0) to (x1, y1), both included
+    def inRange(self, x0, y0, x1, y1):
+        size = self.bucketSize
+        found = []
+        # Small areas are cheaper to look up cell by cell
+        if (x1-x0+1)*(y1-y0+1) <= size:
+            for y in range(y0, y1+1):
+                for x in range(x0, x1+1):
+                    ID = self.cells.get((x, y))
+                    if ID is not None:
+                        found.append(self.entities[ID])
+            return found
+        for by in range(y0//size, y1//size + 1):
+            for bx in range(x0//size, x1//size + 1):
+                bucket = self.buckets.get((bx, by))
+                if bucket is None:
+                    continue
+                for ID in bucket:
+                    x, y = self.positions[ID]
+                    if x0 <= x <= x1 and y0 <= y <= y1:
+                        found.append(self.entities[ID])
+        return found
+
+    # Returns the entities at an euclidean distance of at most radius from the given coords
+    def inRadius(self, coords, radius):
+        cx, cy = coords
+        r = int(radius)
+        limit = radius*radius
+        found = []
+        for entity in self.inRange(cx-r, cy-r, cx+r, cy+r):
+            x, y = self.positions[entity.ID]
+            if (x-cx)**2 + (y-cy)**2 <= limit:
+                found.append(entity)
+        return found
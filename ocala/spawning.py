@@ -0,0 +1,254 @@
+##########################
+###      Spawning      ###
+##########################
+
+# Mob spawning on the free cells of spawn zones. A spawn first tries a few random cells of its zone and
+# takes the first free one, which is all it takes on roomy zones and costs no memory at all. Zones that
+# keep failing that (crowded, or mostly bedrock) and small zones fall back to pools of free cells,
+# sampled without replacement so spawning always ends, even once the zone is full. Pools are built
+# lazily, a block of the zone at a time (a chunk on chunked grids, so building one never loads the
+# rest of the world), and hold flat cell indices in arrays. Zones pick their mobs from weighted tables,
+# never go over their density cap, and respawn their dead mobs after a delay, the pending respawns
+# being kept in a heap ordered by time.
+#
+# Cells taken by something else are only dropped from a pool when they're drawn, and cells that
+# become free again are put back by the map, so keeping the pools up to date costs next to nothing
+
+import heapq
+import random
+from array import array
+from bisect import bisect_right
+
+# Random cells tried before falling back to the pools
+SAMPLE_TRIES = 16
+# Zones with at most this many cells go straight to their pools
+SMALL_ZONE = 4096
+# Side of the blocks pools are built for, on grids that aren't split in chunks
+BLOCK_SIZE = 64
+
+
+# Free cells of a rectangle (x0, y0, x1, y1) of a map width tiles wide, as flat indices. A flag per
+# cell of the rectangle keeps a cell from going in twice
+class FreeCellPool():
+
+    def __init__(self, width, area, cells=()):
+        self.width = width
+        self.area = area
+        x0, y0, x1, y1 = area
+        self.areaWidth = x1 - x0 + 1
+        self.cells = array('l')
+        self.member = bytearray(self.areaWidth*(y1 - y0 + 1))
+        for cell in cells:
+            self.add(cell)
+
+    def __len__(self):
+        return len(self.cells)
+
+    def _slot(self, cell):
+        return (cell[1] - self.area[1])*self.areaWidth + cell[0] - self.area[0]
+
+    def __contains__(self, cell):
+        return self.member[self._slot(cell)] == 1
+
+    def add(self, cell):
+        slot = self._slot(cell)
+        if not self.member[slot]:
+            self.member[slot] = 1
+            self.cells.append(cell[1]*self.width + cell[0])
+
+    # Takes a random cell out of the pool, None if it's empty
+    def pop(self, rng=random):
+        cells = self.cells
+        if not cells:
+            return None
+        i = int(rng.random()*len(cells))
+        index = cells[i]
+        cells[i] = cells[-1]
+        cells.pop()
+        cell = (index % self.width, index//self.width)
+        self.member[self._slot(cell)] = 0
+        return cell
+
+
+class SpawnZone():
+
+    # area is (x0, y0, x1, y1), both corners included, None for the whole map. table holds
+    # (rep, weight) pairs, cap is the most mobs alive at once and respawn the seconds before a
+    # dead mob is replaced (None for never)
+    def __init__(self, name, table, area=None, cap=None, respawn=None):
+        self.name = name
+        self.area = area
+        self.cap = cap
+        self.respawn = respawn
+        self.reps = [rep for rep, weight in table]
+        # Cumulative weights, a mob is picked with a single bisect
+        self.weights = []
+        total = 0
+        for rep, weight in table:
+            total += weight
+            self.weights.append(total)
+        self.alive = 0
+        # Set by place() once the zone is on a map
+        self.bounds = None
+        self.width = 0
+        self.blockSize = BLOCK_SIZE
+        # Whether random cells are still tried before the pools, off for small zones and for
+        # zones where they came up taken SAMPLE_TRIES times in a row
+        self.sampling = False
+        # Blocks that may still have free cells, (block x, block y), and the pools built so far
+        self.open = []
+        self.pools = {}
+        self.exhausted = set()
+
+    # Lays the zone out on grid, the whole map if it has no area. Nothing is read from the grid yet
+    def place(self, grid):
+        self.bounds = x0, y0, x1, y1 = self.area if self.area is not None else (0, 0, grid.width-1, grid.height-1)
+        self.width = grid.width
+        # Blocks line up with the chunks of chunked grids, so a pool never loads more than its chunk
+        size = self.blockSize = getattr(grid, 'chunkSize', BLOCK_SIZE)
+        self.sampling = (x1 - x0 + 1)*(y1 - y0 + 1) > SMALL_ZONE
+        self.open = [(bx, by) for by in range(y0//size, y1//size + 1) for bx in range(x0//size, x1//size + 1)]
+        self.pools = {}
+        self.exhausted = set()
+
+    def contains(self, coords):
+        if self.area is None:
+            return True
+        x0, y0, x1, y1 = self.area
+        return x0 <= coords[0] <= x1 and y0 <= coords[1] <= y1
+
+    # Picks a mob representation from the weighted table
+    def pick(self, rng=random):
+        return self.reps[bisect_right(self.weights, rng.random()*self.weights[-1])]
+
+    # How many more mobs the zone can hold, None if it has no cap
+    def room(self):
+        if self.cap is None:
+            return None
+        return max(0, self.cap - self.alive)
+
+    # A free cell of the zone, None if there's none left
+    def freeCell(self, grid, rng=random):
+        x0, y0, x1, y1 = self.bounds
+        isOccupied = grid.isOccupied
+        if self.sampling:
+            for i in range(SAMPLE_TRIES):
+                coords = (x0 + int(rng.random()*(x1 - x0 + 1)), y0 + int(rng.random()*(y1 - y0 + 1)))
+                if not isOccupied(coords):
+                    return coords
+            self.sampling = False
+        blocks = self.open
+        while blocks:
+            i = int(rng.random()*len(blocks))
+            key = blocks[i]
+            pool = self.pools.get(key)
+            if pool is None:
+                pool = self.pools[key] = self._buildPool(grid, key)
+            while True:
+                coords = pool.pop(rng)
+                if coords is None:
+                    break
+                # Cells taken since they went into the pool are dropped as they come up
+                if not isOccupied(coords):
+                    return coords
+            blocks[i] = blocks[-1]
+            blocks.pop()
+            self.exhausted.add(key)
+        return None
+
+    # Pool of the free cells the block has inside the zone
+    def _buildPool(self, grid, key):
+        size = self.blockSize
+        x0, y0, x1, y1 = self.bounds
+        area = (max(x0, key[0]*size), max(y0, key[1]*size), min(x1, key[0]*size + size - 1), min(y1, key[1]*size + size - 1))
+        return FreeCellPool(self.width, area, grid.freeCells(*area))
+
+    # The cell at coords, inside the zone, was freed. Only pools already built take it, the others
+    # will find it when they're built
+    def cellFreed(self, coords):
+        key = (coords[0]//self.blockSize, coords[1]//self.blockSize)
+        pool = self.pools.get(key)
+        if pool is None:
+            return
+        pool.add(coords)
+        if key in self.exhausted:
+            self.exhausted.discard(key)
+            self.open.append(key)
+
+
+class Spawner():
+
+    def __init__(self, map):
+        self.map = map
+        self.zones = []
+        # entity ID -> the zone it was spawned by
+        self.zoneOf = {}
+        # Pending respawns, (time, order, zone)
+        self.respawns = []
+        self.order = 0
+        # Last time given to update()
+        self.now = 0.0
+
+    def addZone(self, zone):
+        zone.place(self.map.grid)
+        self.zones.append(zone)
+        return zone
+
+    # Spawns a single mob in the zone, returns it, or None if there's no room or no free cell left
+    def spawnOne(self, zone, rng=random):
+        if zone.cap is not None and zone.alive >= zone.cap:
+            return None
+        coords = zone.freeCell(self.map.grid, rng)
+        if coords is None:
+            return None
+        return self.spawnAt(zone, zone.pick(rng), coords)
+
+    # Spawns the mob rep at coords on behalf of the zone, returns it, or None if it couldn't be placed
+    def spawnAt(self, zone, rep, coords):
+        mob = self.map.spawnMob(rep, coords)
+        if mob is not None:
+            self.adopt(zone, mob)
+        return mob
+
+    # Makes the zone responsible for a mob already on the map (i.e: one loaded from a save)
+    def adopt(self, zone, mob):
+        zone.alive += 1
+        self.zoneOf[mob.ID] = zone
+
+    # Spawns up to count mobs in the zone, returns how many were spawned. Stops as soon as the zone
+    # is full or out of free cells, which the pools find out in one step per cell at most
+    def populate(self, zone, count, rng=random):
+        spawned = 0
+        while spawned < count and self.spawnOne(zone, rng) is not None:
+            spawned += 1
+        return spawned
+
+    # The cell at coords was freed, it goes back to the pools of the zones it belongs to
+    def cellFreed(self, coords):
+        for zone in self.zones:
+            if zone.contains(coords):
+                zone.cellFreed(coords)
+
+    # An entity left the map, if a zone spawned it the zone gets a respawn scheduled
+    def removed(self, entity):
+        zone = self.zoneOf.pop(entity.ID, None)
+        if zone is None:
+            return
+        zone.alive -= 1
+        if zone.respawn is not None:
+            self.order += 1
+            heapq.heappush(self.respawns, (self.now + zone.respawn, self.order, zone))
+
+    # Takes the respawns whose time came off the heap, returns their zones
+    def due(self, now):
+        self.now = now
+        respawns = self.respawns
+        zones = []
+        while respawns and respawns[0][0] <= now:
+            zones.append(heapq.heappop(respawns)[2])
+        return zones
+
+    # Spawns the mobs whose respawn time came, only looking at the ones that are due
+    def update(self, now, rng=random):
+        for zone in self.due(now):
+            self.spawnOne(zone, rng)
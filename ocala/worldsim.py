@@ -0,0 +1,247 @@
+##########################
+###  World Simulation  ###
+##########################
+
+# Keeps the maps nobody is on alive. Every map left behind by the player is copied into a shared memory
+# buffer (terrain, entity codes and a table of its mobs), and a pool of worker processes gives each of
+# them a coarse update every so often: mobs wander a step at random and due respawns are placed. Only
+# the buffer's name goes through the pool, the maps themselves are never pickled. When the player comes
+# back, the buffer is read into the Map objects, so the map is up to date the moment it's entered.
+#
+# The main loop never waits on the workers: a map whose last update isn't done yet just skips this one,
+# and a finished update is read back into its map on the next coarse tick, so saving a game finds every
+# map at most a coarse step behind without having to wait for anything
+#
+# Layout of a map's buffer, little-endian:
+#   header  - width (I), height (I), mobs (I), capacity (I)
+#   terrain - width*height tile codes
+#   cells   - width*height entity codes, EMPTY where there's none
+#   records - capacity mob records: ID (q, NEW for the ones spawned by a worker), x (i), y (i), rep (H),
+#             zone (H, index in the map's spawner, only for NEW records)
+
+import multiprocessing
+import random
+import struct
+from multiprocessing import resource_tracker, shared_memory
+from .grid import BLOCKING, EMPTY, TileGrid
+from .pathfinding import NEIGHBOURS
+
+# Seconds between coarse updates of every map
+COARSE_STEP = 2.0
+# Chance of every mob taking a step on each coarse update
+WANDER = 0.5
+# Random cells tried to place a respawned mob before giving up on it
+SPAWN_TRIES = 32
+# Records kept for mobs spawned while the map is off-screen, on top of the ones it had
+SLACK = 16
+
+HEADER = struct.Struct('<IIII')
+RECORD = struct.Struct('<qiiHH')
+NEW = -1
+
+##########################
+###      Workers       ###
+##########################
+
+# Buffers attached by this worker process, by name, so each one is only attached once
+ATTACHED = {}
+
+def attach(name):
+    shm = ATTACHED.get(name)
+    if shm is None:
+        shm = ATTACHED[name] = shared_memory.SharedMemory(name)
+    return shm
+
+# Coarse update of the map in the named buffer, run by a worker. spawns holds (zone, rep, area) requests,
+# area being (x0, y0, x1, y1), both corners included. Returns how many of them were placed
+def coarseTick(name, seed, spawns):
+    buf = attach(name).buf
+    width, height, count, capacity = HEADER.unpack_from(buf, 0)
+    size = width*height
+    terrain = buf[HEADER.size:HEADER.size + size]
+    cells = buf[HEADER.size + size:HEADER.size + 2*size]
+    base = HEADER.size + 2*size
+    rng = random.Random(seed)
+
+    def free(x, y):
+        if 0 <= x < width and 0 <= y < height:
+            i = y*width + x
+            return not BLOCKING[terrain[i]] and cells[i] == EMPTY
+        return False
+
+    for n in range(count):
+        if rng.random() >= WANDER:
+            continue
+        offset = base + n*RECORD.size
+        ID, x, y, rep, zone = RECORD.unpack_from(buf, offset)
+        dx, dy = NEIGHBOURS[int(rng.random()*len(NEIGHBOURS))]
+        if free(x+dx, y+dy):
+            cells[y*width + x] = EMPTY
+            cells[(y+dy)*width + x+dx] = rep
+            RECORD.pack_into(buf, offset, ID, x+dx, y+dy, rep, zone)
+    placed = 0
+    for zone, rep, (x0, y0, x1, y1) in spawns:
+        if count >= capacity:
+            break
+        # Requests without a free cell are dropped, same as Spawner.spawnOne with an empty pool
+        for attempt in range(SPAWN_TRIES):
+            x, y = rng.randint(x0, x1), rng.randint(y0, y1)
+            if free(x, y):
+                cells[y*width + x] = rep
+                RECORD.pack_into(buf, base + count*RECORD.size, NEW, x, y, rep, zone)
+                count += 1
+                placed += 1
+                break
+    HEADER.pack_into(buf, 0, width, height, count, capacity)
+    terrain.release()
+    cells.release()
+    return placed
+
+##########################
+###    Main process    ###
+##########################
+
+# A map's shared buffer, seen from the main process
+class SharedMap():
+
+    def __init__(self, m, capacity):
+        self.map = m
+        self.width = m.grid.width
+        self.height = m.grid.height
+        self.capacity = capacity
+        size = self.width*self.height
+        self.shm = shared_memory.SharedMemory(create=True, size=HEADER.size + 2*size + capacity*RECORD.size)
+        self.name = self.shm.name
+        # Respawns requested per zone since the buffer was last read, so zone caps hold in between
+        self.requested = {}
+
+    # Checks if the buffer can hold the map as it is now
+    def fits(self, m):
+        return (m.grid.width, m.grid.height) == (self.width, self.height) and len(m.mobsInMap) + SLACK <= self.capacity
+
+    # Copies the map into the buffer
+    def export(self):
+        m, buf = self.map, self.shm.buf
+        size = self.width*self.height
+        mobs = list(m.mobsInMap.values())
+        HEADER.pack_into(buf, 0, self.width, self.height, len(mobs), self.capacity)
+        buf[HEADER.size:HEADER.size + size] = m.grid.terrain
+        buf[HEADER.size + size:HEADER.size + 2*size] = m.grid.entities
+        base = HEADER.size + 2*size
+        for n, mob in enumerate(mobs):
+            RECORD.pack_into(buf, base + n*RECORD.size, mob.ID, mob.coords[0], mob.coords[1], mob.rep, 0)
+        self.requested = {}
+
+    # Brings the map up to date with the buffer: mobs are moved where the workers left them, the ones
+    # they spawned are created. The buffer is written again afterwards, new mobs having their IDs
+    def load(self):
+        m, buf = self.map, self.shm.buf
+        count = HEADER.unpack_from(buf, 0)[2]
+        base = HEADER.size + 2*self.width*self.height
+        moves = []
+        spawned = []
+        for n in range(count):
+            ID, x, y, rep, zone = RECORD.unpack_from(buf, base + n*RECORD.size)
+            if ID == NEW:
+                spawned.append((zone, rep, (x, y)))
+                continue
+            mob = m.mobsInMap.get(ID)
+            if mob is not None and mob.coords != (x, y):
+                moves.append((mob, mob.coords, (x, y)))
+        # Every mob is lifted before any is put down, as they may have moved into each other's cells
+        for mob, old, new in moves:
+            m.unplot(old)
+        for mob, old, new in moves:
+            m.plot(new, mob.rep)
+            m.index.move(mob, new)
+            mob.coords = new
+        for mob, old, new in moves:
+            if not m.isOccupied(old):
+                m.spawner.cellFreed(old)
+        for zone, rep, coords in spawned:
+            m.spawner.spawnAt(m.spawner.zones[zone], rep, coords)
+        self.export()
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+class WorldSim():
+
+    def __init__(self, workers=None, seed=None):
+        # Workers have to share the main process' resource tracker, or each one would start its own, and
+        # it would unlink the buffers the worker attached to as soon as the worker exits
+        resource_tracker.ensure_running()
+        self.pool = multiprocessing.Pool(workers)
+        # map ID -> SharedMap, kept after a map stops being simulated so it can be reused
+        self.shared = {}
+        # map ID -> Map, the ones being simulated
+        self.tracked = {}
+        # map ID -> result of the map's last coarse update
+        self.jobs = {}
+        self.rng = random.Random(seed)
+        self.updates = 0
+        # Updates skipped because the map's previous one wasn't done
+        self.skipped = 0
+
+    # Starts simulating the map, returns whether it can be. Worlds streamed from disk are left alone
+    def track(self, m):
+        if not isinstance(m.grid, TileGrid):
+            return False
+        shared = self.shared.get(m.ID)
+        if shared is None or not shared.fits(m):
+            if shared is not None:
+                shared.close()
+            shared = self.shared[m.ID] = SharedMap(m, len(m.mobsInMap) + m.spawnSpots + SLACK)
+        shared.map = m
+        shared.export()
+        self.tracked[m.ID] = m
+        return True
+
+    # Reads the finished coarse updates back into their maps, and hands a new one of every map that isn't
+    # busy to the pool, the due respawns along with it
+    def update(self, now, dt):
+        for mapID, m in self.tracked.items():
+            job = self.jobs.get(mapID)
+            if job is not None and not job.ready():
+                self.skipped += 1
+                continue
+            shared = self.shared[mapID]
+            if job is not None:
+                del self.jobs[mapID]
+                job.get()
+                shared.load()
+            spawns = []
+            for zone in m.spawner.due(now):
+                requested = shared.requested.get(zone, 0)
+                if zone.cap is not None and zone.alive + requested >= zone.cap:
+                    continue
+                shared.requested[zone] = requested + 1
+                area = zone.area if zone.area is not None else (0, 0, m.grid.width-1, m.grid.height-1)
+                spawns.append((m.spawner.zones.index(zone), zone.pick(self.rng), area))
+            self.jobs[mapID] = self.pool.apply_async(coarseTick, (shared.name, self.rng.getrandbits(32), spawns))
+            self.updates += 1
+
+    # Waits for the map's coarse update, if there's one going on, and reads its buffer back into it
+    def sync(self, m):
+        if m.ID not in self.tracked:
+            return
+        job = self.jobs.pop(m.ID, None)
+        if job is not None:
+            job.get()
+        self.shared[m.ID].load()
+
+    # Stops simulating the map, bringing it up to date first (i.e: the player is about to enter it)
+    def release(self, m):
+        self.sync(m)
+        self.tracked.pop(m.ID, None)
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
+        for shared in self.shared.values():
+            shared.close()
+        self.shared.clear()
+        self.tracked.clear()
+        self.jobs.clear()
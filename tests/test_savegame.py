@@ -0,0 +1,136 @@
+##########################
+###  Save Game Tests   ###
+##########################
+
+# Saves a game and loads it back, checking the world comes back as it was saved
+#
+#   python -m unittest discover tests
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from ocala import Game, savegame
+from ocala.chunks import ChunkedGrid, ChunkFile
+
+
+class SaveGameTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.save = savegame.SaveFile(os.path.join(self.dir, "test.sav"))
+        Game.newGame()
+
+    def tearDown(self):
+        for m in Game.SESSION.allMaps():
+            if getattr(m.grid, 'file', None) is not None:
+                m.grid.file.close()
+        Game.SESSION.close()
+        shutil.rmtree(self.dir)
+
+    def roundTrip(self):
+        Game.saveGame(self.save)
+        Game.loadGame(self.save.path)
+        return Game.player
+
+    def testPlayer(self):
+        player = Game.player
+        player.grantExp(100.0)
+        player.hp = 1
+        potion = Game.ITEMS[0]
+        player.backpack.add(potion, 3)
+        loaded = self.roundTrip()
+        self.assertEqual((loaded.name, loaded.coords, loaded.level, loaded.exp), (player.name, player.coords, player.level, player.exp))
+        self.assertEqual([s.name for s in loaded.skills], [s.name for s in player.skills])
+        self.assertIs(loaded.backpack.owner, loaded)
+        loaded.backpack.use(potion.name)
+        self.assertGreater(loaded.hp, 1)
+        self.assertEqual(loaded.backpack.storage[0][1], 2)
+
+    def testMobs(self):
+        saved = sorted((mob.name, mob.coords, mob.hp) for mob in Game.MAPLIST["Current"].mobsInMap.values())
+        self.roundTrip()
+        loaded = sorted((mob.name, mob.coords, mob.hp) for mob in Game.MAPLIST["Current"].mobsInMap.values())
+        self.assertEqual(loaded, saved)
+
+    # Mobs killed after loading are respawned by the map's zone like before saving
+    def testSpawnZones(self):
+        self.roundTrip()
+        m = Game.MAPLIST["Current"]
+        zone, = m.spawner.zones
+        self.assertEqual(zone.alive, len(m.mobsInMap))
+        mob = next(iter(m.mobsInMap.values()))
+        m.removeEntity(mob)
+        self.assertEqual(zone.alive, len(m.mobsInMap))
+
+    # Saving past COMPACT_AFTER snapshots starts the file over, and it still loads
+    def testCompact(self):
+        for i in range(savegame.COMPACT_AFTER + 1):
+            Game.saveGame(self.save)
+        self.assertEqual(self.save.snapshots, 1)
+        Game.player.hp = 7
+        self.roundTrip()
+        self.assertEqual(Game.player.hp, 7)
+
+    def testTerrain(self):
+        m = Game.MAPLIST["Current"]
+        Game.saveGame(self.save)
+        m.setTerrain((1, 1), 0)
+        self.roundTrip()
+        self.assertEqual(Game.MAPLIST["Current"].grid.terrainAt((1, 1)), 0)
+
+    # A whole snapshot cut short (i.e: the first autosave after launching) leaves the save there as it was
+    def testInterruptedSave(self):
+        Game.saveGame(self.save)
+        level = Game.player.level
+        Game.player.grantExp(100.0)
+        def crash(fd):
+            raise OSError("disk full")
+        fsync, savegame.os.fsync = savegame.os.fsync, crash
+        try:
+            with self.assertRaises(OSError):
+                Game.saveGame(savegame.SaveFile(self.save.path))
+        finally:
+            savegame.os.fsync = fsync
+        Game.loadGame(self.save.path)
+        self.assertEqual(Game.player.level, level)
+
+    # Terrain changed after saving doesn't leak into the loaded game, even once its chunks were evicted
+    def testChunkedTerrain(self):
+        chunkFile = ChunkFile.create(os.path.join(self.dir, "world.chunks"), 100, 100, chunkSize=16)
+        world = Game.Map("World", ChunkedGrid(chunkFile, maxResident=2), 0, [])
+        Game.SESSION.maps["World"] = world
+        Game.SESSION.bind()
+        world.setTerrain((50, 50), 0)
+        Game.saveGame(self.save)
+        world.setTerrain((50, 50), 1)
+        world.setTerrain((60, 60), 0)
+        for x in range(0, 100, 16):
+            world.grid.terrainAt((x, 90))
+        self.assertEqual(world.grid.terrainAt((60, 60)), 0)
+        Game.loadGame(self.save.path)
+        grid = Game.MAPLIST["World"].grid
+        self.assertEqual(grid.terrainAt((50, 50)), 0)
+        self.assertEqual(grid.terrainAt((60, 60)), 1)
+
+    # Chunks saved by a snapshot cut short before reaching the chunk file are written there on load
+    def testChunksOnLoad(self):
+        path = os.path.join(self.dir, "world.chunks")
+        world = Game.Map("World", ChunkedGrid(ChunkFile.create(path, 100, 100, chunkSize=16)), 0, [])
+        Game.SESSION.maps["World"] = world
+        Game.SESSION.bind()
+        world.setTerrain((20, 20), 0)
+        records = self.save.records((Game.ID, Game.ITEM_ID, Game.SKILL_ID, Game.MAP_ID), Game.SESSION.allMaps(),
+                                    [(Game.player, True)], Game.MAPLIST["Current"], Game.player)
+        with open(self.save.path, 'wb') as f:
+            f.write(savegame.HEADER.pack(savegame.MAGIC, savegame.VERSION) + b''.join(records))
+        unsaved = ChunkFile(path)
+        self.assertEqual(unsaved.read(1, 1)[4*16 + 4], 1)
+        unsaved.close()
+        Game.loadGame(self.save.path)
+        self.assertEqual(Game.MAPLIST["World"].grid.terrainAt((20, 20)), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()